@@ -1,50 +1,228 @@
 import pandas as pd
-from dash import Dash, dcc, html, Input, Output, State, dash_table
+import numpy as np
+from dash import Dash, DiskcacheManager, dcc, html, Input, Output, State, dash_table
 import plotly.express as px
 import dash
 import re
+import os
+import json
+import hashlib
+import hmac
+import math
+import random
+import base64
+import gzip
+import io
+import tempfile
+import zipfile
+from html import escape
+from urllib.parse import quote
+import sqlite3
+from collections import OrderedDict
+import threading
+import time
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from flask import Response, abort, g, request
+
+try:
+    import pyarrow as pa  # dipakai pandas untuk format Feather / Arrow IPC
+    FORMAT_CACHE = "feather"
+except ImportError:
+    pa = None
+    FORMAT_CACHE = "pickle"
+
+try:
+    import kaleido  # dipakai plotly untuk menulis PNG (pip install kaleido)
+except ImportError:
+    kaleido = None
+
+# Waktu yang dihabiskan di kode pandas selama satu request callback (dilaporkan di /metrics).
+# Bisa dipakai sebagai `with waktu_pandas():` atau dekorator `@waktu_pandas()`; pemanggilan
+# bersarang hanya dihitung sekali di level terluar.
+_pandas_local = threading.local()
+
+@contextmanager
+def waktu_pandas():
+    kedalaman = getattr(_pandas_local, "kedalaman", 0)
+    _pandas_local.kedalaman = kedalaman + 1
+    mulai = time.perf_counter()
+    try:
+        yield
+    finally:
+        _pandas_local.kedalaman = kedalaman
+        if kedalaman == 0:
+            _pandas_local.total = getattr(_pandas_local, "total", 0.0) + time.perf_counter() - mulai
 
 # Fungsi untuk load & proses data
-def load_and_process(filepath, tahun, jenis):
-    df = pd.read_excel(filepath, header=2)
-    df.columns = df.columns.map(lambda x: str(x).strip() if not pd.isna(x) else x)
-
-    nama_guru_col = df.columns[1]
-    df.rename(columns={nama_guru_col: "Nama Guru"}, inplace=True)
-    df = df.dropna(subset=["Nama Guru"]).reset_index(drop=True)
-    df["Nama Guru"] = df["Nama Guru"].astype(str)
-    df["Nama Guru"] = df["Nama Guru"].str.replace(r",.*", "", regex=True)  # Hilangkan gelar
-    df["Nama Guru"] = df["Nama Guru"].str.strip()
-    # print("Sample Nama Guru:", df["Nama Guru"].unique()[:10])
-
-    invalid_nama = {"A", "B", "C", "D", "E", "F", "G", "H", "I", "J", "K",
-                    "Jumlah", "Total", "Ban", "25%", "0.25", "0.75", "", "SB"}
-    df = df[~df["Nama Guru"].isin(invalid_nama)]
-    df = df[df["Nama Guru"].str.len() > 2]
-
+# Secara default workbook dibaca baris per baris dan hanya kolom nama & indikator yang diambil:
+# lewat python-calamine kalau terpasang (jauh lebih cepat), kalau tidak openpyxl read-only.
+# SUPERVISI_INGEST=pandas memakai pd.read_excel seperti dulu.
+INGEST_PANDAS = os.environ.get("SUPERVISI_INGEST", "streaming") == "pandas"
+
+invalid_nama = {"A", "B", "C", "D", "E", "F", "G", "H", "I", "J", "K",
+                "Jumlah", "Total", "Ban", "25%", "0.25", "0.75", "", "SB"}
+# Teks yang dianggap kosong oleh pd.read_excel (na_values bawaan pandas)
+_teks_kosong = {"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+                "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"}
+_pola_setelah_koma = re.compile(r",.*")
+
+# Sel error Excel, dibaca pandas sebagai NaN
+_kode_error = {"#NULL!", "#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#NUM!", "#N/A"}
+
+try:
+    import python_calamine
+except ImportError:
+    python_calamine = None
+try:
+    from openpyxl import load_workbook
+except ImportError:
+    load_workbook = None
+    if python_calamine is None:
+        INGEST_PANDAS = True
+
+def pilih_kolom_indikator(kolom, jenis, filepath):
+    # kolom: nama kolom setelah diberi akhiran .1 untuk duplikat (seperti pandas)
     if jenis == "Penilaian Rencana Pelaksanaan Pembelajaran":
         indikator_all = list("ABCDEFG")
-        indikator_1st = [i for i in indikator_all if i in df.columns]
-        indikator_2nd_raw = [f"{i}.1" for i in indikator_1st if f"{i}.1" in df.columns]
+        indikator_1st = [i for i in indikator_all if i in kolom]
+        indikator_2nd_raw = [f"{i}.1" for i in indikator_1st if f"{i}.1" in kolom]
         indikator = indikator_1st  # Ini dipakai untuk periode ke-2 juga
 
     elif jenis == "Penilaian Pelaksanaan Pembelajaran":
         indikator_1st = list("ABCDEFGHIJ")
         indikator_2nd_raw = [f"{c}.1" for c in indikator_1st]
-        if 'K' in df.columns:
+        if 'K' in kolom:
             indikator_2nd_raw.append('K')
-        elif 'K.1' in df.columns:
+        elif 'K.1' in kolom:
             indikator_2nd_raw.append('K.1')
         indikator = list("ABCDEFGHIJK")
 
     else:
-        raise ValueError("Jenis penilaian tidak dikenali")
+        # Jenis lain yang ditemukan di folder data: indikator = kolom berkode satu huruf kapital
+        indikator_1st = [c for c in kolom if isinstance(c, str) and len(c) == 1 and "A" <= c <= "Z"]
+        if not indikator_1st:
+            raise ValueError(f"Jenis penilaian tidak dikenali dan tidak ada kolom indikator di file {filepath}")
+        indikator_2nd_raw = [f"{i}.1" for i in indikator_1st if f"{i}.1" in kolom]
+        indikator = indikator_1st
 
     for col in indikator_1st + indikator_2nd_raw:
-        if col not in df.columns:
+        if col not in kolom:
             raise ValueError(f"Kolom indikator '{col}' tidak ditemukan di file {filepath}")
+    return indikator_1st, indikator_2nd_raw, indikator
+
+def _baca_excel_pandas(filepath, jenis):
+    df = pd.read_excel(filepath, header=2)
+    df.columns = df.columns.map(lambda x: str(x).strip() if not pd.isna(x) else x)
+
+    nama_guru_col = df.columns[1]
+    df.rename(columns={nama_guru_col: "Nama Guru"}, inplace=True)
+    df = df.dropna(subset=["Nama Guru"]).reset_index(drop=True)
+    df["Nama Guru"] = df["Nama Guru"].astype(str)
+    df["Nama Guru"] = df["Nama Guru"].str.replace(r",.*", "", regex=True)  # Hilangkan gelar
+    df["Nama Guru"] = df["Nama Guru"].str.strip()
+    # print("Sample Nama Guru:", df["Nama Guru"].unique()[:10])
+
+    df = df[~df["Nama Guru"].isin(invalid_nama)]
+    df = df[df["Nama Guru"].str.len() > 2]
+
+    indikator_1st, indikator_2nd_raw, indikator = pilih_kolom_indikator(df.columns, jenis, filepath)
+    kolom = indikator_1st + indikator_2nd_raw
+    df[kolom] = df[kolom].apply(pd.to_numeric, errors='coerce')
+    return df, indikator_1st, indikator_2nd_raw, indikator
+
+def _nama_kolom_excel(header):
+    # Tiru penamaan kolom pd.read_excel(header=...): sel kosong jadi "Unnamed: i", nama kembar
+    # diberi akhiran .1, .2, ... (sebelum di-strip), lalu di-strip
+    nama = [f"Unnamed: {i}" if v is None or v == "" else v for i, v in enumerate(header)]
+    hitung = {}
+    for i, col in enumerate(nama):
+        n = hitung.get(col, 0)
+        while n > 0:
+            hitung[col] = n + 1
+            col = f"{col}.{n}"
+            n = hitung.get(col, 0)
+        nama[i] = col
+        hitung[col] = n + 1
+    return [str(c).strip() for c in nama]
+
+def _sel_ke_angka(nilai):
+    if isinstance(nilai, (int, float)):
+        return float(nilai)
+    if isinstance(nilai, str):
+        try:
+            return float(nilai)
+        except ValueError:
+            pass
+    return float("nan")
+
+def _sel_ke_nama(nilai):
+    # None kalau baris ini bukan baris guru (kosong, legenda, Jumlah/Total, ...)
+    if nilai is None or isinstance(nilai, float) and nilai != nilai:
+        return None
+    if isinstance(nilai, float) and nilai.is_integer():
+        nilai = int(nilai)
+    if isinstance(nilai, str) and (nilai in _teks_kosong or nilai in _kode_error):
+        return None
+    nama = _pola_setelah_koma.sub("", str(nilai)).strip()  # Hilangkan gelar
+    if nama in invalid_nama or len(nama) <= 2:
+        return None
+    return nama
+
+def _baris_workbook(filepath):
+    # Nilai sel sheet pertama per baris, dengan indeks kolom 0 = kolom A
+    if python_calamine is not None:
+        wb = python_calamine.CalamineWorkbook.from_path(filepath)
+        try:
+            sheet = wb.get_sheet_by_index(0)
+            # iter_rows mulai dari baris 1 tapi dari kolom pertama yang terisi
+            geser = [None] * sheet.start[1] if sheet.start else []
+            for row in sheet.iter_rows():
+                yield geser + row
+        finally:
+            wb.close()
+    else:
+        wb = load_workbook(filepath, read_only=True, data_only=True, keep_links=False)
+        try:
+            yield from wb.worksheets[0].iter_rows(values_only=True)
+        finally:
+            wb.close()
+
+def _baca_excel_streaming(filepath, jenis):
+    # Header (baris ke-3) menentukan kolom yang diambil; baris yang bukan guru langsung dibuang
+    # dan kolom lain (Jumlah, Total, catatan, ...) tidak pernah disimpan
+    baris = _baris_workbook(filepath)
+    header = ()
+    for i, row in enumerate(baris):
+        if i == 2:
+            header = row
+            break
+    kolom = _nama_kolom_excel(header)
+    indikator_1st, indikator_2nd_raw, indikator = pilih_kolom_indikator(kolom, jenis, filepath)
+    diambil = indikator_1st + indikator_2nd_raw
+    posisi = [kolom.index(c) for c in diambil]
+
+    nama_list = []
+    nilai_list = []
+    for row in baris:
+        if len(row) < 2:
+            continue
+        nama = _sel_ke_nama(row[1])
+        if nama is None:
+            continue
+        nama_list.append(nama)
+        nilai_list.append([_sel_ke_angka(row[p]) if p < len(row) else float("nan") for p in posisi])
+    baris.close()
+
+    df = pd.DataFrame(nilai_list, columns=diambil, dtype="float64")
+    df.insert(0, "Nama Guru", pd.Series(nama_list, dtype=object))
+    return df, indikator_1st, indikator_2nd_raw, indikator
 
-    df[indikator_1st + indikator_2nd_raw] = df[indikator_1st + indikator_2nd_raw].apply(pd.to_numeric, errors='coerce')
+def load_and_process(filepath, tahun, jenis):
+    baca = _baca_excel_pandas if INGEST_PANDAS else _baca_excel_streaming
+    df, indikator_1st, indikator_2nd_raw, indikator = baca(filepath, jenis)
 
     df_1st = df[["Nama Guru"] + indikator_1st].copy()
     df_1st["Periode"] = "1st"
@@ -61,55 +239,1527 @@ def load_and_process(filepath, tahun, jenis):
 
     return pd.concat([df_1st, df_2nd], ignore_index=True)
 
-# Load semua dataset
-datasets = {
-    "Penilaian Rencana Pelaksanaan Pembelajaran": {
-        "2020-2021": load_and_process("Penilaian Rencana Pelaksanaan Pembelajaran 2020-2021.xlsx", "2020-2021", "Penilaian Rencana Pelaksanaan Pembelajaran"),
-        "2022-2023": load_and_process("Penilaian Rencana Pelaksanaan Pembelajaran 2022-2023.xlsx", "2022-2023", "Penilaian Rencana Pelaksanaan Pembelajaran"),
-        "2023-2024": load_and_process("Penilaian Rencana Pelaksanaan Pembelajaran 2023-2024.xlsx", "2023-2024", "Penilaian Rencana Pelaksanaan Pembelajaran")
-    },
-    "Penilaian Pelaksanaan Pembelajaran": {
-        "2020-2021": load_and_process("Penilaian Pelaksanaan Pembelajaran 2020-2021.xlsx", "2020-2021", "Penilaian Pelaksanaan Pembelajaran"),
-        "2022-2023": load_and_process("Penilaian Pelaksanaan Pembelajaran 2022-2023.xlsx", "2022-2023", "Penilaian Pelaksanaan Pembelajaran"),
-        "2023-2024": load_and_process("Penilaian Pelaksanaan Pembelajaran 2023-2024.xlsx", "2023-2024", "Penilaian Pelaksanaan Pembelajaran")
-    }
-}
-
-# Harus setelah datasets selesai dibuat
-def get_all_guru_usernames():
-    usernames = set()
-
-    # Daftar gelar akademik (tanpa titik, untuk pencocokan kasar)
-    gelar_keywords = [
-        "spd", "ssi", "ssn", "ssos", "shum", "sip", "skom", "sh", "se",
-        "mpd", "mhum", "msn", "msi", "mkom", "mh", "ss"
-    ]
-
-    def hapus_gelar(nama):
-        # Bersihkan nama: lowercase, hilangkan spasi, koma, titik
-        nama = re.sub(r"[\s.,]", "", nama.lower())
-
-        # Hilangkan semua gelar yang ada di akhir nama
-        for gelar in gelar_keywords:
-            nama = re.sub(rf"{gelar}$", "", nama)
-        # Ulangi untuk kasus dua gelar berturut-turut
-        for gelar in gelar_keywords:
-            nama = re.sub(rf"{gelar}$", "", nama)
-        return nama
+# Cache hasil load_and_process di disk supaya start ulang tidak perlu parsing Excel lagi
+CACHE_DIR = os.environ.get("SUPERVISI_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+CACHE_VERSI = 1  # Naikkan kalau bentuk keluaran load_and_process berubah
+cache_stats = {"hit": 0, "miss": 0}
+
+def _hash_file(filepath):
+    h = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for blok in iter(lambda: f.read(1 << 20), b""):
+            h.update(blok)
+    return h.hexdigest()
+
+def _baca_cache(data_path):
+    if FORMAT_CACHE == "feather":
+        return pd.read_feather(data_path)
+    return pd.read_pickle(data_path)
+
+def _tulis_cache(df, data_path):
+    # Tulis ke file sementara dulu lalu rename, supaya tidak ada cache setengah jadi
+    tmp_path = f"{data_path}.tmp"
+    if FORMAT_CACHE == "feather":
+        df.to_feather(tmp_path)
+    else:
+        df.to_pickle(tmp_path)
+    os.replace(tmp_path, data_path)
+
+def _tulis_meta(meta, meta_path):
+    tmp_path = f"{meta_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+def load_cached(filepath, tahun, jenis):
+    path_abs = os.path.abspath(filepath)
+    kunci = hashlib.sha1(path_abs.encode("utf-8")).hexdigest()[:16]
+    meta_path = os.path.join(CACHE_DIR, f"{kunci}.json")
+    data_path = os.path.join(CACHE_DIR, f"{kunci}.{FORMAT_CACHE}")
+    stat = os.stat(path_abs)
+
+    meta = None
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    sumber_sama = (
+        meta is not None
+        and os.path.exists(data_path)
+        and meta.get("versi") == CACHE_VERSI
+        and meta.get("format") == FORMAT_CACHE
+        and meta.get("path") == path_abs
+        and meta.get("tahun") == tahun
+        and meta.get("jenis") == jenis
+        and meta.get("size") == stat.st_size
+    )
+    content_hash = None
+    if sumber_sama and meta.get("mtime_ns") != stat.st_mtime_ns:
+        # mtime berubah (misal file disalin ulang): cek isi file sebelum parsing ulang
+        content_hash = _hash_file(path_abs)
+        sumber_sama = meta.get("sha256") == content_hash
+
+    if sumber_sama:
+        try:
+            df = _baca_cache(data_path)
+        except Exception as e:
+            print(f"Cache rusak untuk {filepath}, parsing ulang: {e}")
+        else:
+            cache_stats["hit"] += 1
+            if meta.get("mtime_ns") != stat.st_mtime_ns:
+                meta["mtime_ns"] = stat.st_mtime_ns
+                _tulis_meta(meta, meta_path)
+            return df
+
+    cache_stats["miss"] += 1
+    df = load_and_process(filepath, tahun, jenis)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        _tulis_cache(df, data_path)
+        _tulis_meta({
+            "versi": CACHE_VERSI,
+            "format": FORMAT_CACHE,
+            "path": path_abs,
+            "tahun": tahun,
+            "jenis": jenis,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": content_hash or _hash_file(path_abs),
+        }, meta_path)
+    except OSError as e:
+        print(f"Gagal menulis cache untuk {filepath}: {e}")
+    return df
+
+# Penyimpanan permanen: SQLite (mode WAL). Setelah workbook diimpor sekali, database inilah
+# sumber datanya; edit ditulis per baris yang berubah dalam satu transaksi.
+DB_PATH = os.environ.get("SUPERVISI_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "supervisi.db"))
+_db_local = threading.local()
+
+# Dataset juga diekspor sebagai file Arrow IPC. Worker lain (mis. gunicorn -w N) yang melihat versi di
+# database berubah tinggal memetakan file itu ke memori, tanpa query ulang. Menulis snapshot berarti
+# menulis seluruh tabel, jadi edit hanya menulisnya tiap SNAPSHOT_SETIAP versi atau kalau snapshot
+# terakhir sudah lebih dari SNAPSHOT_DETIK detik; versi tanpa snapshot dibaca dari tabel nilai oleh
+# worker pertama yang membutuhkannya, lalu snapshotnya ditulis saat itu.
+SNAPSHOT_DIR = f"{DB_PATH}-snapshot"
+KOLOM_SNAPSHOT = ["Nama Guru", "Periode", "Tahun", "Indikator", "Nilai"]
+SNAPSHOT_SETIAP = int(os.environ.get("SUPERVISI_SNAPSHOT_SETIAP", "50"))
+SNAPSHOT_DETIK = float(os.environ.get("SUPERVISI_SNAPSHOT_DETIK", "60"))
+_snapshot_terakhir = {}  # (jenis, tahun) -> (versi, waktu monotonic) snapshot terakhir yang ditulis/dibaca
+
+def _db():
+    conn = getattr(_db_local, "conn", None)
+    if conn is None:
+        conn = _db_local.conn = _buka_db()
+    return conn
+
+def _buka_db():
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("""CREATE TABLE IF NOT EXISTS dataset (
+        jenis TEXT NOT NULL, tahun TEXT NOT NULL, sumber TEXT, sha256 TEXT,
+        versi INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (jenis, tahun))""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS nilai (
+        jenis TEXT NOT NULL, tahun TEXT NOT NULL, nama_guru TEXT NOT NULL, periode TEXT NOT NULL,
+        indikator TEXT NOT NULL, nilai REAL, urutan INTEGER NOT NULL,
+        PRIMARY KEY (jenis, tahun, nama_guru, periode, indikator))""")
+    return conn
+
+def _nilai_db(nilai):
+    nilai = _ke_angka(nilai)
+    return None if pd.isna(nilai) else nilai
+
+def _kunci_snapshot(jenis, tahun):
+    return hashlib.sha1(f"{jenis}|{tahun}".encode("utf-8")).hexdigest()
+
+def _path_snapshot(jenis, tahun, versi):
+    return os.path.join(SNAPSHOT_DIR, f"{_kunci_snapshot(jenis, tahun)}-{versi}.arrow")
+
+def perlu_snapshot(jenis, tahun, versi):
+    versi_snapshot, waktu = _snapshot_terakhir.get((jenis, tahun), (0, 0.0))
+    return versi - versi_snapshot >= SNAPSHOT_SETIAP or time.monotonic() - waktu >= SNAPSHOT_DETIK
+
+def tulis_snapshot(jenis, tahun, versi, df, timpa=True):
+    # Dipanggil sebelum COMMIT, jadi begitu versi baru terlihat di database filenya sudah ada.
+    # timpa=False untuk pembaca yang isinya diambil dari versi yang sudah di-commit: kalau worker lain
+    # sudah menulis snapshot versi itu, isinya sama. Gagal menulis hanya dicatat; pembaca berikutnya
+    # tinggal membaca tabel nilai. True kalau snapshot ada sesudahnya.
+    if pa is None:
+        return False
+    path = _path_snapshot(jenis, tahun, versi)
+    if not timpa and os.path.exists(path):
+        return True
+    tmp_path = None
+    try:
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        df = df[KOLOM_SNAPSHOT].assign(Nilai=pd.to_numeric(df["Nilai"], errors="coerce").astype("float64"))
+        tabel = pa.Table.from_pandas(df, preserve_index=False)
+        # Nama sementara unik per proses & thread: beberapa worker bisa menulis versi yang sama bersamaan
+        fd, tmp_path = tempfile.mkstemp(dir=SNAPSHOT_DIR, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+        with os.fdopen(fd, "wb") as sink, pa.ipc.new_file(sink, tabel.schema) as writer:
+            writer.write_table(tabel)
+        os.replace(tmp_path, path)
+    except (OSError, pa.ArrowException) as e:
+        print(f"⚠️ Snapshot {jenis} {tahun} versi {versi} gagal ditulis: {e}")
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    _snapshot_terakhir[(jenis, tahun)] = (versi, time.monotonic())
+    # Snapshot sebelumnya disisakan untuk worker yang mungkin sedang membacanya, yang lebih lama dihapus
+    awalan = f"{_kunci_snapshot(jenis, tahun)}-"
+    versi_ada = sorted(int(nama[len(awalan):-len(".arrow")]) for nama in os.listdir(SNAPSHOT_DIR)
+                       if nama.startswith(awalan) and nama.endswith(".arrow"))
+    for lama in [v for v in versi_ada if v < versi][:-1]:
+        try:
+            os.remove(_path_snapshot(jenis, tahun, lama))
+        except FileNotFoundError:
+            pass  # Sudah dihapus worker lain
+    return True
 
-    for jenis_data in datasets.values():
-        for df in jenis_data.values():
-            cleaned = df["Nama Guru"].dropna().astype(str).apply(hapus_gelar)
-            usernames.update(cleaned.unique())
+def hapus_snapshot(jenis, tahun, versi):
+    # Untuk transaksi yang batal: snapshot versi yang tidak jadi di-commit tidak boleh tertinggal
+    try:
+        os.remove(_path_snapshot(jenis, tahun, versi))
+    except FileNotFoundError:
+        pass
+
+def baca_snapshot(jenis, tahun, versi):
+    # None kalau snapshot versi ini tidak ada (pyarrow tidak terpasang, atau sudah dihapus)
+    if pa is None:
+        return None
+    try:
+        tabel = pa.ipc.open_file(pa.memory_map(_path_snapshot(jenis, tahun, versi), "r")).read_all()
+    except (FileNotFoundError, pa.ArrowInvalid):
+        return None
+    if versi > _snapshot_terakhir.get((jenis, tahun), (0, 0.0))[0]:
+        _snapshot_terakhir[(jenis, tahun)] = (versi, time.monotonic())
+    return tabel.to_pandas()
+
+def versi_dataset_db(jenis, tahun):
+    row = _db().execute("SELECT versi FROM dataset WHERE jenis = ? AND tahun = ?", (jenis, tahun)).fetchone()
+    return None if row is None else row[0]
+
+def sha256_dataset_db(jenis, tahun):
+    # Hash workbook yang terakhir diimpor ke (jenis, tahun)
+    row = _db().execute("SELECT sha256 FROM dataset WHERE jenis = ? AND tahun = ?", (jenis, tahun)).fetchone()
+    return None if row is None else row[0]
+
+@waktu_pandas()
+def baca_dataset_db(jenis, tahun):
+    # Kembalikan (df, versi); None kalau (jenis, tahun) belum pernah diimpor
+    conn = _db()
+    # Versi dan isi dibaca dalam satu transaksi supaya snapshot tidak tertulis dengan label versi yang salah
+    conn.execute("BEGIN")
+    try:
+        versi = versi_dataset_db(jenis, tahun)
+        if versi is None:
+            return None
+        df = baca_snapshot(jenis, tahun, versi)
+        if df is None:
+            df = pd.read_sql_query(
+                "SELECT nama_guru, periode, tahun, indikator, nilai FROM nilai WHERE jenis = ? AND tahun = ? ORDER BY urutan",
+                conn, params=(jenis, tahun))
+            df.columns = KOLOM_SNAPSHOT
+            df["Nilai"] = df["Nilai"].astype("float64")
+            tulis_snapshot(jenis, tahun, versi, df, timpa=False)
+    finally:
+        conn.execute("COMMIT")
+    return df, versi
+
+def impor_dataset_db(jenis, tahun, df, sumber=None, sha256=None, ganti=False):
+    # Isi (jenis, tahun) dengan df dan kembalikan (df, versi); baris dengan kunci ganda hanya disimpan
+    # yang pertama. Tanpa ganti=True, None kalau proses lain sudah lebih dulu mengimpor dataset ini;
+    # dengan ganti=True, None kalau workbook yang sama (sha256) sudah diimpor.
+    duplikat = df.duplicated(["Nama Guru", "Periode", "Indikator"])
+    if duplikat.any():
+        print(f"⚠️ {int(duplikat.sum())} baris duplikat di {jenis} {tahun} diabaikan")
+        df = df[~duplikat].reset_index(drop=True)
+    conn = _db()
+    versi = None
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        lama = conn.execute("SELECT versi, sha256 FROM dataset WHERE jenis = ? AND tahun = ?", (jenis, tahun)).fetchone()
+        if lama is not None and (not ganti or (sha256 is not None and lama[1] == sha256)):
+            conn.execute("ROLLBACK")
+            return None
+        versi = (lama[0] if lama else 0) + 1
+        conn.execute("DELETE FROM nilai WHERE jenis = ? AND tahun = ?", (jenis, tahun))
+        conn.executemany(
+            "INSERT INTO nilai (jenis, tahun, nama_guru, periode, indikator, nilai, urutan) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(jenis, tahun, str(nama), str(periode), str(indikator), _nilai_db(nilai), i)
+             for i, (nama, periode, indikator, nilai) in enumerate(
+                 df[["Nama Guru", "Periode", "Indikator", "Nilai"]].itertuples(index=False))])
+        conn.execute(
+            """INSERT INTO dataset (jenis, tahun, sumber, sha256, versi) VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT (jenis, tahun) DO UPDATE SET sumber = excluded.sumber, sha256 = excluded.sha256,
+               versi = excluded.versi""",
+            (jenis, tahun, sumber, sha256, versi))
+        tulis_snapshot(jenis, tahun, versi, df)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        if versi is not None:
+            hapus_snapshot(jenis, tahun, versi)
+        raise
+    return df, versi
+
+def tulis_perubahan_db(jenis, tahun, versi_lama, df_baru, ubah, hapus, tambah):
+    # ubah: [(kunci lama, baris baru)], hapus: [kunci], tambah: [baris]; semuanya satu transaksi.
+    # Kembalikan versi baru, atau None kalau worker lain sudah menulis sejak versi_lama dimuat.
+    conn = _db()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if versi_dataset_db(jenis, tahun) != versi_lama:
+            conn.execute("ROLLBACK")
+            return None
+        for (nama, periode, indikator), row in ubah:
+            conn.execute(
+                """UPDATE nilai SET nama_guru = ?, periode = ?, indikator = ?, nilai = ?
+                   WHERE jenis = ? AND tahun = ? AND nama_guru = ? AND periode = ? AND indikator = ?""",
+                (str(row["Nama Guru"]), str(row["Periode"]), str(row["Indikator"]), _nilai_db(row["Nilai"]),
+                 jenis, tahun, nama, periode, indikator))
+        conn.executemany(
+            "DELETE FROM nilai WHERE jenis = ? AND tahun = ? AND nama_guru = ? AND periode = ? AND indikator = ?",
+            [(jenis, tahun, *kunci) for kunci in hapus])
+        if tambah:
+            urutan = conn.execute("SELECT COALESCE(MAX(urutan), -1) FROM nilai WHERE jenis = ? AND tahun = ?",
+                                  (jenis, tahun)).fetchone()[0]
+            conn.executemany(
+                "INSERT INTO nilai (jenis, tahun, nama_guru, periode, indikator, nilai, urutan) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(jenis, tahun, str(row["Nama Guru"]), str(row["Periode"]), str(row["Indikator"]),
+                  _nilai_db(row["Nilai"]), urutan + 1 + i) for i, row in enumerate(tambah)])
+        conn.execute("UPDATE dataset SET versi = ? WHERE jenis = ? AND tahun = ?", (versi_lama + 1, jenis, tahun))
+        if perlu_snapshot(jenis, tahun, versi_lama + 1):
+            tulis_snapshot(jenis, tahun, versi_lama + 1, df_baru)
+        conn.execute("COMMIT")
+    except sqlite3.IntegrityError as e:
+        conn.execute("ROLLBACK")
+        raise ValueError("Nama guru, periode dan indikator itu sudah ada di data tahun ini.") from e
+    except BaseException:
+        conn.execute("ROLLBACK")
+        hapus_snapshot(jenis, tahun, versi_lama + 1)
+        raise
+    return versi_lama + 1
+
+# Daftar gelar akademik (tanpa titik, untuk pencocokan kasar)
+gelar_keywords = [
+    "spd", "ssi", "ssn", "ssos", "shum", "sip", "skom", "sh", "se",
+    "mpd", "mhum", "msn", "msi", "mkom", "mh", "ss"
+]
+_pola_bersih_nama = re.compile(r"[\s.,]")
+# Hilangkan gelar di akhir nama, termasuk dua gelar berturut-turut
+_pola_gelar = re.compile(rf"(?:{'|'.join(gelar_keywords)}){{1,2}}$")
+
+def hapus_gelar(nama):
+    # Bersihkan nama: lowercase, hilangkan spasi, koma, titik
+    return _pola_gelar.sub("", _pola_bersih_nama.sub("", nama.lower()))
+
+# Index username (nama tanpa spasi & gelar) -> nama asli guru. Dibangun sekali saat dataset
+# dimuat lalu diperbarui per perubahan nama, jadi pengecekan login cukup lookup dict.
+username_index = {}
+_nama_refs = {}  # nama asli -> jumlah dataset yang memuat nama itu
+_nama_per_dataset = {}  # (jenis, tahun) -> set nama asli
+_username_lock = threading.Lock()
+
+# Index trigram nama guru untuk kotak cari, dropdown guru dan login. Kuncinya nama huruf kecil tanpa
+# spasi & tanda baca; tiap kunci dipecah jadi trigram (diberi padding seperti pg_trgm) sehingga
+# pencarian substring cukup mengiris beberapa set, dan kemiripan ejaan dihitung dari trigram yang sama.
+# Diperbarui bersama username_index, di bawah _username_lock.
+_nama_per_kunci = {}  # kunci cari -> set nama asli
+_trigram_index = {}  # trigram -> set kunci cari
+_trigram_per_kunci = {}  # kunci cari -> set trigram
+_pola_bukan_huruf = re.compile(r"[\W_]")
+
+def kunci_cari(teks):
+    return _pola_bukan_huruf.sub("", str(teks).lower())
+
+def _trigram(kunci):
+    teks = f"  {kunci} "
+    return {teks[i:i + 3] for i in range(len(teks) - 2)}
+
+def _tambah_index_cari(nama):
+    kunci = kunci_cari(nama)
+    if kunci not in _nama_per_kunci:
+        _nama_per_kunci[kunci] = set()
+        trigram = _trigram_per_kunci[kunci] = _trigram(kunci)
+        for t in trigram:
+            _trigram_index.setdefault(t, set()).add(kunci)
+    _nama_per_kunci[kunci].add(nama)
+
+def _hapus_index_cari(nama):
+    kunci = kunci_cari(nama)
+    _nama_per_kunci[kunci].discard(nama)
+    if not _nama_per_kunci[kunci]:
+        del _nama_per_kunci[kunci]
+        for t in _trigram_per_kunci.pop(kunci):
+            _trigram_index[t].discard(kunci)
+            if not _trigram_index[t]:
+                del _trigram_index[t]
+
+def _trigram_sama(trigram, skor_min):
+    # Jumlah trigram yang sama per kunci, hanya untuk kunci yang bisa berbagi >= skor_min * |trigram|.
+    # Kunci seperti itu pasti memuat salah satu dari (|trigram| - perlu + 1) trigram paling jarang,
+    # jadi trigram yang sangat umum tidak perlu ditelusuri.
+    perlu = math.ceil(skor_min * len(trigram))
+    jarang = sorted(trigram, key=lambda t: len(_trigram_index.get(t, ())))[:len(trigram) - perlu + 1]
+    kandidat = set().union(*(_trigram_index.get(t, ()) for t in jarang))
+    return {k: len(trigram & _trigram_per_kunci[k]) for k in kandidat}
+
+def cari_guru(teks, mirip=True, skor_min=0.5, batas=None):
+    # Nama asli yang cocok dengan teks, berperingkat: awalan, lalu substring, lalu (kalau mirip=True)
+    # nama yang memuat sebagian besar trigram teks (salah ketik). Huruf besar/kecil, spasi dan tanda
+    # baca diabaikan.
+    kunci = kunci_cari(teks)
+    if not kunci:
+        return []
+    inti = [kunci[i:i + 3] for i in range(len(kunci) - 2)]  # Pasti ada semua di kunci yang memuat teks
+    with _username_lock:
+        if inti:
+            posting = sorted((_trigram_index.get(t, set()) for t in inti), key=len)
+            kandidat = set(posting[0]).intersection(*posting[1:])
+        else:
+            kandidat = list(_nama_per_kunci)
+        cocok = [k for k in kandidat if kunci in k]
+        urutan = sorted(cocok, key=lambda k: (not k.startswith(kunci), k))
+        if mirip and len(set(inti)) >= 2 and (batas is None or len(urutan) < batas):
+            sudah = set(cocok)
+            skor = [(n / len(set(inti)), k) for k, n in _trigram_sama(set(inti), skor_min).items() if k not in sudah]
+            urutan += [k for s, k in sorted(skor, key=lambda x: (-x[0], x[1])) if s >= skor_min]
+        hasil = [nama for k in urutan for nama in sorted(_nama_per_kunci[k])]
+    return hasil[:batas] if batas else hasil
+
+def cari_username_mirip(nama_user, skor_min=0.5, selisih_min=0.1):
+    # Untuk login: username dengan salah ketik kecil / gelar berbeda diterima kalau hanya ada satu
+    # nama yang jelas paling mirip (irisan / gabungan trigram). Kembalikan nama asli guru atau None.
+    trigram = _trigram(kunci_cari(nama_user))
+    with _username_lock:
+        # Irisan / gabungan >= skor_min berarti irisan >= skor_min * |trigram|
+        skor = sorted(((k, n / (len(trigram) + len(_trigram_per_kunci[k]) - n))
+                       for k, n in _trigram_sama(trigram, skor_min).items()), key=lambda x: -x[1])
+        if not skor or skor[0][1] < skor_min or (len(skor) > 1 and skor[0][1] - skor[1][1] < selisih_min):
+            return None
+        nama = _nama_per_kunci[skor[0][0]]
+        return next(iter(nama)) if len(nama) == 1 else None
+
+def _nama_unik(df):
+    if df is None or "Nama Guru" not in df.columns:
+        return set()
+    if isinstance(df["Nama Guru"].dtype, pd.CategoricalDtype):
+        return set(df["Nama Guru"].cat.remove_unused_categories().cat.categories)
+    return set(df["Nama Guru"].dropna().astype(str).unique())
+
+def perbarui_username_index(jenis, tahun, df):
+    nama_baru = _nama_unik(df)
+    with _username_lock:
+        nama_lama = _nama_per_dataset.get((jenis, tahun), set())
+        for nama in nama_baru - nama_lama:
+            _nama_refs[nama] = _nama_refs.get(nama, 0) + 1
+            if _nama_refs[nama] == 1:
+                username_index.setdefault(hapus_gelar(nama), set()).add(nama)
+                _tambah_index_cari(nama)
+        for nama in nama_lama - nama_baru:
+            _nama_refs[nama] -= 1
+            if _nama_refs[nama] == 0:
+                del _nama_refs[nama]
+                _hapus_index_cari(nama)
+                username = hapus_gelar(nama)
+                username_index[username].discard(nama)
+                if not username_index[username]:
+                    del username_index[username]
+        _nama_per_dataset[(jenis, tahun)] = nama_baru
+
+# Kolom teks disimpan sebagai categorical. Kamus kategorinya dipakai bersama oleh semua dataset
+# dan hanya pernah ditambah, jadi kode yang sama berarti nilai yang sama di tahun mana pun dan
+# frame dari beberapa tahun bisa digabung tanpa kembali ke object. Nilai tetap float64: ada
+# nilai pecahan seperti 14.6 yang tidak pas di float32.
+KOLOM_KATEGORI = ["Nama Guru", "Periode", "Tahun", "Indikator", "Nama Guru Normalized"]
+_kategori = {kolom: pd.Index([], dtype=object) for kolom in KOLOM_KATEGORI}
+_kategori_lock = threading.Lock()
+
+def dtype_kategori(kolom):
+    return pd.CategoricalDtype(_kategori[kolom])
+
+def ke_kategori(df):
+    # Ubah kolom teks df (di tempat) ke categorical dengan kamus bersama, tambah kategori baru bila perlu
+    with _kategori_lock:
+        for kolom in KOLOM_KATEGORI:
+            if kolom not in df.columns:
+                continue
+            if isinstance(df[kolom].dtype, pd.CategoricalDtype):
+                nilai = df[kolom].cat.categories
+            else:
+                df[kolom] = df[kolom].astype(str)
+                nilai = pd.Index(df[kolom].unique())
+            baru = nilai[~nilai.isin(_kategori[kolom])]
+            if len(baru):
+                _kategori[kolom] = _kategori[kolom].append(baru)
+            df[kolom] = df[kolom].astype(dtype_kategori(kolom))
+    return df
+
+def seragamkan_kategori(frames):
+    # Frame lama bisa punya kamus yang lebih pendek; samakan dulu supaya pd.concat tetap categorical
+    return [f.astype({k: dtype_kategori(k) for k in KOLOM_KATEGORI if k in f.columns}) for f in frames]
+
+def kunci_urut(kolom):
+    # Categorical diurutkan menurut urutan kategori, padahal tabel harus urut abjad
+    return kolom.astype(str) if isinstance(kolom.dtype, pd.CategoricalDtype) else kolom
+
+def pemakaian_memori():
+    # Byte per (jenis, tahun), termasuk isi string dan kamus kategori
+    return {(jenis, tahun): int(df.memory_usage(deep=True).sum())
+            for jenis, per_tahun in list(datasets.items()) for tahun, df in list(per_tahun.items())}
+
+# Index baris per guru: (jenis, tahun) -> (DataFrame, {nama normalized: array posisi baris}).
+# Frame ikut disimpan supaya posisi baris selalu cocok dengan frame yang diindex.
+guru_index = {}
+
+def normalisasi_nama(nama):
+    # Sama dengan pencocokan username: tanpa spasi, huruf kecil
+    return str(nama).replace(" ", "").lower().strip()
+
+def normalisasi_kolom_nama(kolom):
+    if isinstance(kolom.dtype, pd.CategoricalDtype):
+        # Cukup normalisasi tiap kategori sekali, lalu petakan lewat kode
+        kategori = normalisasi_kolom_nama(pd.Series(kolom.cat.categories, dtype=object)).to_numpy()
+        return pd.Series(kategori[kolom.cat.codes.to_numpy()], index=kolom.index)
+    return kolom.astype(str).str.replace(" ", "").str.lower().str.strip()
+
+def username_ke_nama(username):
+    return username.replace("@ses.com", "").strip().lower()
+
+def _ke_angka(nilai):
+    try:
+        return float(nilai)
+    except (TypeError, ValueError):
+        return float("nan")
+
+# Agregat per (jenis, tahun) untuk kartu ringkasan: jumlah & banyak nilai per indikator, per guru,
+# per (guru, periode) dan per periode. Edit cukup menambah/mengurangi selisihnya.
+agregat = {}
+_kartu_cache = {}  # (jenis, tahun) -> (agregat, hasil kartu)
+
+@waktu_pandas()
+def bangun_agregat(df):
+    d = df.assign(Nilai=pd.to_numeric(df["Nilai"], errors="coerce"))
+
+    def jumlah(by):
+        g = d.groupby(by, sort=False, observed=True)["Nilai"].agg(["sum", "count"])
+        return {k: [float(s), int(c)] for k, s, c in zip(g.index, g["sum"], g["count"])}
+
+    return {
+        "total": [float(d["Nilai"].sum()), int(d["Nilai"].count())],
+        "indikator": jumlah("Indikator"),
+        "guru": jumlah("Nama Guru"),
+        "guru_periode": jumlah(["Nama Guru", "Periode"]),
+        "periode": jumlah("Periode"),
+        "baris_guru": {k: int(v) for k, v in d.groupby("Nama Guru", sort=False, observed=True).size().items()},
+    }
 
-    return usernames
+def salin_agregat(agg):
+    return {k: ([*v] if k == "total" else dict(v) if k == "baris_guru" else {kk: [*vv] for kk, vv in v.items()})
+            for k, v in agg.items()}
+
+def ubah_agregat(agg, nama, periode, indikator, nilai, tanda):
+    # tanda +1 untuk baris yang masuk, -1 untuk baris yang keluar
+    agg["baris_guru"][nama] = agg["baris_guru"].get(nama, 0) + tanda
+    if agg["baris_guru"][nama] == 0:
+        del agg["baris_guru"][nama]
+    nilai = _ke_angka(nilai)
+    if pd.isna(nilai):
+        return
+    for bagian, kunci in (("indikator", indikator), ("guru", nama), ("guru_periode", (nama, periode)), ("periode", periode)):
+        jumlah = agg[bagian].setdefault(kunci, [0.0, 0])
+        jumlah[0] += tanda * nilai
+        jumlah[1] += tanda
+        if jumlah[1] == 0:
+            del agg[bagian][kunci]
+    agg["total"][0] += tanda * nilai
+    agg["total"][1] += tanda
+
+def _rata2(jumlah):
+    # Dibulatkan supaya selisih floating point dari update inkremental tidak mengubah urutan
+    return round(jumlah[0] / jumlah[1], 9) if jumlah and jumlah[1] else float("nan")
+
+def _idx_max(rata2, terkecil=False):
+    # Seperti Series.idxmax/idxmin setelah groupby: kunci terurut, NaN dilewati, seri ambil yang pertama
+    hasil = None
+    for kunci in sorted(rata2):
+        nilai = rata2[kunci]
+        if pd.isna(nilai):
+            continue
+        if hasil is None or (nilai < rata2[hasil] if terkecil else nilai > rata2[hasil]):
+            hasil = kunci
+    return hasil
+
+def hitung_kartu(jenis, tahun):
+    agg = agregat[(jenis, tahun)]
+    cache = _kartu_cache.get((jenis, tahun))
+    if cache is not None and cache[0] is agg:
+        return cache[1]
+
+    rata2_indikator = {k: _rata2(v) for k, v in agg["indikator"].items()}
+    periode_ada = {p for (_, p) in agg["guru_periode"]}
+    peningkatan = {}
+    for nama in {n for (n, _) in agg["guru_periode"]}:
+        nilai_2nd = _rata2(agg["guru_periode"].get((nama, "2nd"))) if "2nd" in periode_ada else 0
+        nilai_1st = _rata2(agg["guru_periode"].get((nama, "1st"))) if "1st" in periode_ada else 0
+        peningkatan[nama] = nilai_2nd - nilai_1st
+
+    hasil = {
+        "total_guru": len(agg["baris_guru"]),
+        "rata_rata": _rata2(agg["total"]),
+        "top_indikator": _idx_max(rata2_indikator),
+        "bottom_indikator": _idx_max(rata2_indikator, terkecil=True),
+        "top_guru": _idx_max({k: _rata2(v) for k, v in agg["guru"].items()}),
+        "best_improve": _idx_max(peningkatan) or "—",
+    }
+    _kartu_cache[(jenis, tahun)] = (agg, hasil)
+    return hasil
+
+# Versi data: naik setiap kali ada dataset yang diganti/diedit. Per guru dicatat versi terakhir
+# barisnya berubah, supaya cache grafik guru lain tetap terpakai setelah edit.
+_versi_counter = 0
+_versi_lock = threading.Lock()
+dataset_versi = {}  # (jenis, tahun) -> versi
+versi_guru = {}  # (jenis, tahun) -> (versi dasar, {nama normalized: versi})
+
+# Cache figure grafik batang per (jenis, tahun, guru, versi data guru itu), LRU
+MAKS_CACHE_GRAFIK = int(os.environ.get("SUPERVISI_CACHE_GRAFIK", "256"))
+_cache_grafik = OrderedDict()
+_cache_grafik_lock = threading.Lock()
+
+def hapus_cache_grafik(jenis, tahun, guru_berubah=None):
+    # Buang figure guru yang barisnya berubah (atau semua guru di dataset itu)
+    with _cache_grafik_lock:
+        for kunci in [k for k in _cache_grafik if k[:2] == (jenis, tahun)
+                      and (guru_berubah is None or k[2] in guru_berubah)]:
+            del _cache_grafik[kunci]
+
+def get_versi_guru(jenis, tahun, nama_normalized):
+    dasar, per_guru = versi_guru[(jenis, tahun)]
+    return per_guru.get(nama_normalized, dasar)
+
+def _naikkan_versi(jenis, tahun, guru_berubah):
+    global _versi_counter
+    with _versi_lock:
+        _versi_counter += 1
+        versi = _versi_counter
+    if guru_berubah is None or (jenis, tahun) not in versi_guru:
+        versi_guru[(jenis, tahun)] = (versi, {})
+    else:
+        dasar, per_guru = versi_guru[(jenis, tahun)]
+        versi_guru[(jenis, tahun)] = (dasar, {**per_guru, **{n: versi for n in guru_berubah}})
+    dataset_versi[(jenis, tahun)] = versi
+    return versi
+
+@waktu_pandas()
+def ganti_dataset(jenis, tahun, df, agregat_baru=None, guru_berubah=None):
+    # guru_berubah: set nama normalized yang barisnya berubah; None berarti seluruh dataset baru
+    if "Nama Guru" not in df.columns:
+        df = pd.DataFrame(columns=["Nama Guru", "Periode", "Tahun", "Indikator", "Nilai"])
+    df = ke_kategori(df.reset_index(drop=True))
+    df["Nama Guru Normalized"] = normalisasi_kolom_nama(df["Nama Guru"])
+    ke_kategori(df)
+    guru_index[(jenis, tahun)] = (df, df.groupby("Nama Guru Normalized", sort=False, observed=True).indices)
+    agregat[(jenis, tahun)] = agregat_baru if agregat_baru is not None else bangun_agregat(df)
+    datasets[jenis][tahun] = df
+    perbarui_username_index(jenis, tahun, df)
+    _naikkan_versi(jenis, tahun, guru_berubah)
+    hapus_cache_grafik(jenis, tahun, guru_berubah)
+
+def perbarui_nilai_dataset(jenis, tahun, df, agregat_baru, guru_berubah):
+    # Seperti ganti_dataset untuk frame yang hanya beda kolom Nilai-nya: index guru, username dan
+    # nilai sah dipakai ulang dari frame lama
+    _, index = guru_index[(jenis, tahun)]
+    guru_index[(jenis, tahun)] = (df, index)
+    cache = _nilai_sah.get((jenis, tahun))
+    if cache is not None and cache[0] is datasets[jenis][tahun]:
+        _nilai_sah[(jenis, tahun)] = (df, cache[1])
+    agregat[(jenis, tahun)] = agregat_baru
+    datasets[jenis][tahun] = df
+    _naikkan_versi(jenis, tahun, guru_berubah)
+    hapus_cache_grafik(jenis, tahun, guru_berubah)
+
+def baris_guru(jenis, tahun, nama_normalized):
+    # Ambil baris satu guru langsung lewat index, tanpa scan seluruh frame
+    df, index = guru_index[(jenis, tahun)]
+    posisi = index.get(nama_normalized)
+    if posisi is None:
+        return df.iloc[0:0]
+    return df.iloc[posisi]
+
+def baris_banyak_guru(jenis, tahun, daftar_normalized):
+    # Sama dengan baris_guru untuk banyak guru sekaligus, cukup satu iloc
+    df, index = guru_index[(jenis, tahun)]
+    posisi = [index[n] for n in daftar_normalized if n in index]
+    if not posisi:
+        return df.iloc[0:0]
+    return df.iloc[np.concatenate(posisi)]
+
+def posisi_baris(jenis, tahun, nama, periode, indikator):
+    # Satu baris diidentifikasi oleh (nama guru, periode, indikator) di dalam (jenis, tahun)
+    df, index = guru_index[(jenis, tahun)]
+    for pos in index.get(normalisasi_nama(nama), []):
+        if df.at[pos, "Nama Guru"] == nama and df.at[pos, "Periode"] == periode and df.at[pos, "Indikator"] == indikator:
+            return pos
+    return None
+
+# Periode & indikator yang ada di dataset, untuk validasi input dari tabel / form Tambah Data.
+# Dihitung ulang hanya kalau frame-nya diganti.
+_nilai_sah = {}  # (jenis, tahun) -> (df, {kolom: set nilai})
+
+def nilai_sah(jenis, tahun, kolom):
+    df = datasets[jenis][tahun]
+    cache = _nilai_sah.get((jenis, tahun))
+    if cache is None or cache[0] is not df:
+        cache = (df, {k: set(df[k].dropna().unique()) for k in ("Periode", "Indikator")})
+        _nilai_sah[(jenis, tahun)] = cache
+    return cache[1][kolom]
+
+def validasi_baris(jenis, tahun, baris, nilai_mentah=None):
+    # Kembalikan pesan kesalahan, atau None kalau baris boleh disimpan. baris boleh hanya
+    # berisi kolom yang berubah; nilai kosong berarti belum diobservasi (NaN)
+    if "Nama Guru" in baris and not str(baris["Nama Guru"]).strip():
+        return "Nama Guru kosong"
+    for kolom in ("Periode", "Indikator"):
+        if kolom in baris and baris[kolom] not in nilai_sah(jenis, tahun, kolom):
+            return f"{kolom} '{baris[kolom]}' tidak ada di {jenis} {tahun}"
+    if "Nilai" in baris and nilai_mentah not in (None, "") and not math.isfinite(baris["Nilai"]):
+        return f"Nilai '{nilai_mentah}' bukan angka"
+    return None
+
+def terapkan_perubahan(jenis, tahun, ubah=(), tambah=(), hapus=(), harapan=None):
+    # ubah: [(kunci, {kolom: nilai})], tambah: [baris], hapus: [kunci]; kunci = (nama, periode, indikator).
+    # harapan: {kunci: (versi database saat tabel dimuat, nilai saat itu)} untuk baris di ubah. Kalau
+    # dataset sudah berubah sejak versi itu, edit tetap digabung selama baris itu sendiri belum diubah
+    # orang lain; kalau sudah, editnya ditolak dan kuncinya dikembalikan di "konflik".
+    # Kembalikan {"tidak_ketemu": jumlah, "konflik": [kunci], "versi": versi database sesudahnya}
+    for ulang in range(MAKS_ULANG_TULIS):
+        hasil = _coba_terapkan(jenis, tahun, ubah, tambah, hapus, harapan or {})
+        if hasil is not None:
+            return hasil
+        # Worker lain menulis lebih dulu: tunggu sebentar (acak, makin lama tiap gagal) supaya para
+        # penulis tidak terus bertabrakan, lalu muat versinya dan terapkan ulang edit di atasnya
+        time.sleep(random.uniform(0, 0.05 * 2 ** ulang))
+        segarkan_dataset(paksa=True)
+    raise ValueError("Data sedang banyak diubah bersamaan, coba simpan lagi.")
+
+@waktu_pandas()
+def _coba_terapkan(jenis, tahun, ubah, tambah, hapus, harapan):
+    # Seluruh baca-ubah-pasang di bawah kunci tulis: edit dari thread lain di proses ini menunggu,
+    # edit dari worker lain ketahuan lewat versi database di tulis_perubahan_db
+    with tulis_dataset(jenis, tahun):
+        return _terapkan_terkunci(jenis, tahun, ubah, tambah, hapus, harapan)
+
+def _terapkan_terkunci(jenis, tahun, ubah, tambah, hapus, harapan):
+    versi_lama = versi_db_lokal.get((jenis, tahun))
+    # Salinan dangkal: hanya kolom yang diisi yang disalin (lihat salin_kolom), frame lama tetap utuh
+    df = datasets[jenis][tahun].copy(deep=False)
+    kolom_diubah = set()
+
+    def salin_kolom(kolom):
+        if kolom not in kolom_diubah:
+            df[kolom] = df[kolom].copy()
+            kolom_diubah.add(kolom)
+
+    agg = salin_agregat(agregat[(jenis, tahun)])
+    kolom_agregat = ["Nama Guru", "Periode", "Indikator", "Nilai"]
+    guru_berubah = set()
+    tidak_ketemu = 0
+    konflik = []
+    db_ubah, db_hapus = [], []
+    for kunci, nilai_baru in ubah:
+        pos = posisi_baris(jenis, tahun, *kunci)
+        if pos is None:
+            tidak_ketemu += 1
+            continue
+        versi_dasar, nilai_asal = harapan.get(kunci, (versi_lama, None))
+        if versi_dasar != versi_lama and not _sama(df.at[pos, "Nilai"], nilai_asal):
+            # Baris ini sudah diubah orang lain sejak tabel dimuat; kalau isinya kebetulan sudah sama, lewati saja
+            if not all(_sama(df.at[pos, k], v) for k, v in nilai_baru.items()):
+                konflik.append(kunci)
+            continue
+        ubah_agregat(agg, *df.loc[pos, kolom_agregat], tanda=-1)
+        guru_berubah.add(normalisasi_nama(df.at[pos, "Nama Guru"]))
+        for kolom, nilai in nilai_baru.items():
+            salin_kolom(kolom)
+            if isinstance(df[kolom].dtype, pd.CategoricalDtype) and nilai not in df[kolom].cat.categories:
+                df[kolom] = df[kolom].cat.add_categories([nilai])
+            df.at[pos, kolom] = nilai
+        ubah_agregat(agg, *df.loc[pos, kolom_agregat], tanda=1)
+        guru_berubah.add(normalisasi_nama(df.at[pos, "Nama Guru"]))
+        db_ubah.append((kunci, df.loc[pos]))
+    buang = []
+    for kunci in hapus:
+        pos = posisi_baris(jenis, tahun, *kunci)
+        if pos is None:
+            tidak_ketemu += 1
+        else:
+            buang.append(pos)
+            ubah_agregat(agg, *df.loc[pos, kolom_agregat], tanda=-1)
+            guru_berubah.add(normalisasi_nama(df.at[pos, "Nama Guru"]))
+            db_hapus.append(kunci)
+    if buang:
+        df = df.drop(index=buang)
+    baris_baru = pd.DataFrame(list(tambah), columns=["Nama Guru", "Periode", "Tahun", "Indikator", "Nilai"])
+    for row in baris_baru[kolom_agregat].itertuples(index=False):
+        ubah_agregat(agg, *row, tanda=1)
+        guru_berubah.add(normalisasi_nama(row[0]))
+
+    if not (db_ubah or db_hapus or len(baris_baru)):
+        return {"tidak_ketemu": tidak_ketemu, "konflik": konflik, "versi": versi_lama}
+    if len(baris_baru):
+        df = pd.concat([df, baris_baru], ignore_index=True)
+
+    # Tulis ke database dulu; kalau gagal (misal kunci bentrok) data di memori tidak ikut berubah
+    versi = tulis_perubahan_db(jenis, tahun, versi_lama, df, db_ubah, db_hapus, baris_baru.to_dict("records"))
+    if versi is None:
+        return None
+    if kolom_diubah <= {"Nilai"} and not buang and not len(baris_baru):
+        # Hanya nilai sel yang berubah: posisi baris dan nama guru tetap, index tidak perlu dibangun ulang
+        perbarui_nilai_dataset(jenis, tahun, df, agg, guru_berubah)
+    else:
+        ganti_dataset(jenis, tahun, df, agregat_baru=agg, guru_berubah=guru_berubah)
+    versi_db_lokal[(jenis, tahun)] = versi
+    return {"tidak_ketemu": tidak_ketemu, "konflik": konflik, "versi": versi}
+
+# Kunci baca-tulis per (jenis, tahun). Frame dataset tidak pernah diubah di tempat (edit membuat salinan
+# lalu memasangnya lewat ganti_dataset), jadi pembaca cukup dijaga supaya frame, index dan versi yang
+# dibacanya berasal dari versi yang sama. Banyak pembaca boleh jalan bersamaan; penulis (edit, muat
+# ulang) sendirian dan didahulukan supaya tidak kelaparan. Thread yang sudah memegang kunci boleh masuk
+# lagi, dan penulis boleh membaca dataset yang sedang ditulisnya.
+_kunci_dataset = {}  # (jenis, tahun) -> state kunci
+_kunci_dataset_lock = threading.Lock()
+_kunci_local = threading.local()
+
+def _state_kunci(jenis, tahun):
+    with _kunci_dataset_lock:
+        state = _kunci_dataset.get((jenis, tahun))
+        if state is None:
+            state = _kunci_dataset[(jenis, tahun)] = {
+                "kondisi": threading.Condition(), "pembaca": 0, "penulis": None, "kedalaman": 0, "antre": 0}
+    return state
+
+@contextmanager
+def baca_dataset(jenis, tahun):
+    state = _state_kunci(jenis, tahun)
+    if state["penulis"] == threading.get_ident():
+        yield
+        return
+    if not hasattr(_kunci_local, "baca"):
+        _kunci_local.baca = {}
+    dipegang = _kunci_local.baca
+    with state["kondisi"]:
+        if not dipegang.get((jenis, tahun)):
+            state["kondisi"].wait_for(lambda: state["penulis"] is None and not state["antre"])
+        state["pembaca"] += 1
+    dipegang[(jenis, tahun)] = dipegang.get((jenis, tahun), 0) + 1
+    try:
+        yield
+    finally:
+        dipegang[(jenis, tahun)] -= 1
+        with state["kondisi"]:
+            state["pembaca"] -= 1
+            if not state["pembaca"]:
+                state["kondisi"].notify_all()
+
+@contextmanager
+def tulis_dataset(jenis, tahun):
+    state = _state_kunci(jenis, tahun)
+    saya = threading.get_ident()
+    with state["kondisi"]:
+        if state["penulis"] != saya:
+            if getattr(_kunci_local, "baca", {}).get((jenis, tahun)):
+                raise RuntimeError(f"Kunci baca {jenis} {tahun} tidak bisa dinaikkan jadi kunci tulis")
+            state["antre"] += 1
+            state["kondisi"].wait_for(lambda: state["penulis"] is None and not state["pembaca"])
+            state["antre"] -= 1
+            state["penulis"] = saya
+        state["kedalaman"] += 1
+    try:
+        yield
+    finally:
+        with state["kondisi"]:
+            state["kedalaman"] -= 1
+            if not state["kedalaman"]:
+                state["penulis"] = None
+                state["kondisi"].notify_all()
+
+# Versi database dari dataset yang sekarang ada di memori proses ini
+versi_db_lokal = {}
+_segarkan_lock = threading.Lock()
+_db_pantau = None  # Koneksi bersama untuk segarkan_dataset
+_penanda_pantau = None
+_generasi_muat = 0  # naik tiap ada dataset selesai dimuat, memaksa pengecekan versi berikutnya
+MAKS_ULANG_TULIS = 5
+
+def segarkan_dataset(paksa=False):
+    # Dipanggil di awal request callback & API. PRAGMA data_version hanya berubah kalau koneksi lain
+    # (worker lain, atau edit di thread lain) sudah commit, jadi di kasus umum biayanya satu query kecil.
+    # Semua thread memakai satu koneksi pemantau bersama; _segarkan_lock hanya dipegang selama membaca
+    # penanda & daftar versi. Memuat ulang dataset jalan di luar kunci itu (pasang_dataset punya kunci
+    # tulis per dataset), dan penanda baru dicatat setelah semua dataset yang berubah berhasil dimuat,
+    # supaya kalau gagal request berikutnya mencoba lagi.
+    global _db_pantau, _penanda_pantau
+    with _segarkan_lock:
+        if _db_pantau is None:
+            _db_pantau = _buka_db()
+        penanda = (_db_pantau.execute("PRAGMA data_version").fetchone()[0], _generasi_muat)
+        if not paksa and _penanda_pantau == penanda:
+            return
+        versi_terbaru = _db_pantau.execute("SELECT jenis, tahun, versi FROM dataset").fetchall()
+    for jenis, tahun, versi in versi_terbaru:
+        if tahun not in datasets.get(jenis, {}) or versi_db_lokal.get((jenis, tahun), 0) >= versi:
+            continue
+        hasil = baca_dataset_db(jenis, tahun)
+        if hasil is None:
+            continue
+        df, versi = hasil
+        if pasang_dataset(jenis, tahun, df, versi):
+            print(f"Dataset diperbarui dari worker lain: {jenis} {tahun} (versi {versi})")
+    with _segarkan_lock:
+        _penanda_pantau = penanda
+
+def pasang_dataset(jenis, tahun, df, versi):
+    # Pasang df sebagai versi database `versi`, kecuali di memori sudah ada versi yang sama atau lebih
+    # baru (misal edit thread lain selesai lebih dulu). True kalau dipasang.
+    with tulis_dataset(jenis, tahun):
+        if versi_db_lokal.get((jenis, tahun), 0) >= versi:
+            return False
+        ganti_dataset(jenis, tahun, df)
+        versi_db_lokal[(jenis, tahun)] = versi
+    return True
 
-valid_usernames = get_all_guru_usernames()
-# print("==== Daftar username valid ====")
-# print(sorted(valid_usernames))
+# Daftar file workbook per jenis & tahun, dicari dari nama file "Penilaian <jenis> <yyyy-yyyy>.xlsx"
+# di DATA_DIR. Folder itu dipantau (lihat pantau_data_dir), jadi tahun baru cukup ditaruh filenya.
+DATA_DIR = os.environ.get("SUPERVISI_DATA_DIR", os.path.dirname(os.path.abspath(__file__)))
+JENIS_UTAMA = ["Penilaian Rencana Pelaksanaan Pembelajaran", "Penilaian Pelaksanaan Pembelajaran"]
+_pola_file_dataset = re.compile(r"^(Penilaian .+) (\d{4}-\d{4})\.xlsx$")
+
+def temukan_dataset_files(folder):
+    # {jenis: {tahun: path}}; jenis yang sudah dikenal di depan, sisanya urut abjad
+    ditemukan = {}
+    try:
+        nama_file = sorted(os.listdir(folder))
+    except OSError as e:
+        print(f"Folder data {folder} tidak bisa dibaca: {e}")
+        return {}
+    for nama in nama_file:
+        cocok = _pola_file_dataset.match(nama)
+        if cocok:
+            ditemukan.setdefault(cocok.group(1), {})[cocok.group(2)] = os.path.join(folder, nama)
+    urutan = [j for j in JENIS_UTAMA if j in ditemukan] + sorted(j for j in ditemukan if j not in JENIS_UTAMA)
+    return {jenis: ditemukan[jenis] for jenis in urutan}
+
+dataset_files = temukan_dataset_files(DATA_DIR)
+
+# Dataset dimuat di process pool di background, jadi server bisa langsung melayani login.
+# Dengan SUPERVISI_LAZY=1 tiap (jenis, tahun) baru dimuat saat pertama kali dibutuhkan.
+MUAT_LAZY = os.environ.get("SUPERVISI_LAZY", "0") == "1"
+MAX_WORKER_MUAT = int(os.environ.get("SUPERVISI_WORKER_MUAT", "0")) or min(6, os.cpu_count() or 1)
+
+datasets = {jenis: {} for jenis in dataset_files}  # Hanya berisi dataset yang sudah siap
+_muat_futures = {}
+_muat_lock = threading.Lock()
+_muat_pool = None
+
+def _muat_worker(filepath, tahun, jenis):
+    # Jalan di proses terpisah; kembalikan juga hit/miss cache dari proses ini.
+    # Kalau sudah pernah diimpor, database yang dipakai (berisi hasil edit), workbook tidak dibaca.
+    hasil = baca_dataset_db(jenis, tahun)
+    if hasil is not None:
+        if workbook_berubah(jenis, tahun, filepath):
+            peringatan_workbook_berubah(jenis, tahun)
+        return hasil, {k: 0 for k in cache_stats}, "database"
+    sebelum = dict(cache_stats)
+    df = load_cached(filepath, tahun, jenis)
+    hasil = impor_dataset_db(jenis, tahun, df, sumber=os.path.abspath(filepath), sha256=_hash_file(filepath))
+    if hasil is None:
+        # Worker lain sudah mengimpor workbook yang sama lebih dulu
+        return baca_dataset_db(jenis, tahun), {k: cache_stats[k] - sebelum[k] for k in cache_stats}, "database"
+    return hasil, {k: cache_stats[k] - sebelum[k] for k in cache_stats}, "workbook"
+
+def _selesai_muat(jenis, tahun, future):
+    global _muat_pool, _generasi_muat
+    try:
+        (df, versi), stats, asal = future.result()
+    except Exception as e:
+        print(f"Gagal memuat {jenis} {tahun}: {e}")
+        with _muat_lock:
+            # Lupakan future yang gagal supaya akses berikutnya mencoba lagi
+            if _muat_futures.get((jenis, tahun)) is future:
+                del _muat_futures[(jenis, tahun)]
+            if isinstance(e, BrokenProcessPool):
+                _muat_pool = None
+        return
+    with _muat_lock:
+        if tahun in datasets[jenis] or not pasang_dataset(jenis, tahun, df, versi):
+            return
+        _generasi_muat += 1
+        for k, v in stats.items():
+            cache_stats[k] += v
+    print(f"Dataset siap: {jenis} {tahun} (dari {asal}; {pemakaian_memori()[(jenis, tahun)] / 1024:.0f} KB; "
+          f"cache {cache_stats['hit']} hit, {cache_stats['miss']} miss)")
+
+_hasil_fork = False
+
+def _konteks_proses():
+    # fork dari proses yang sudah punya thread (Flask, callback future) bisa deadlock. Proses hasil
+    # fork (job background callback) mewarisi pid forkserver induknya yang tidak bisa dipakai, jadi spawn
+    metode = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() and not _hasil_fork else "spawn"
+    return multiprocessing.get_context(metode)
+
+def _pool():
+    # Dipanggil dengan _muat_lock dipegang
+    global _muat_pool
+    if _muat_pool is None:
+        _muat_pool = ProcessPoolExecutor(max_workers=MAX_WORKER_MUAT, mp_context=_konteks_proses())
+    return _muat_pool
+
+def _reset_setelah_fork():
+    # Proses hasil fork (misal job background callback) tidak boleh memakai koneksi SQLite
+    # atau process pool milik induknya
+    global _db_local, _db_pantau, _muat_pool, _hasil_fork, _kunci_dataset, _kunci_dataset_lock, _kunci_local
+    global _muat_lock, _segarkan_lock, _username_lock, _kategori_lock, _versi_lock, _cache_grafik_lock
+    global _kubus_lock, _metrik_lock
+    _db_local = threading.local()
+    _db_pantau = None
+    _muat_pool = None
+    _hasil_fork = True
+    # Future muat yang belum selesai milik pool induk; di sini tidak akan pernah selesai, jadi
+    # dilupakan supaya get_dataset mengirim ulang ke pool baru
+    _muat_futures.clear()
+    # Kunci yang sedang dipegang thread lain di induk tidak akan pernah dilepas di proses ini
+    _kunci_dataset, _kunci_dataset_lock, _kunci_local = {}, threading.Lock(), threading.local()
+    _muat_lock, _segarkan_lock, _username_lock = threading.Lock(), threading.Lock(), threading.Lock()
+    _kategori_lock, _versi_lock, _cache_grafik_lock = threading.Lock(), threading.Lock(), threading.Lock()
+    _kubus_lock, _metrik_lock = threading.Lock(), threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_setelah_fork)
+
+def muat_dataset(jenis, tahun):
+    # Kirim ke process pool kalau belum pernah diminta; tidak menunggu hasilnya
+    with _muat_lock:
+        future = _muat_futures.get((jenis, tahun))
+        if future is not None:
+            return future
+        future = _pool().submit(_muat_worker, dataset_files[jenis][tahun], tahun, jenis)
+        _muat_futures[(jenis, tahun)] = future
+    future.add_done_callback(lambda f: _selesai_muat(jenis, tahun, f))
+    return future
+
+def masih_memuat():
+    return any(not f.done() for f in _muat_futures.values())
+
+def get_dataset(jenis, tahun, tunggu=False):
+    # None berarti dataset masih dimuat (kecuali tunggu=True); inilah penanda siap yang dicek callback
+    df = datasets.get(jenis, {}).get(tahun)
+    if df is None and tahun in dataset_files.get(jenis, {}):
+        future = muat_dataset(jenis, tahun)
+        if tunggu:
+            try:
+                future.result()
+            except Exception:
+                return None
+            _selesai_muat(jenis, tahun, future)
+            df = datasets[jenis][tahun]
+    return df
+
+# Pemantau DATA_DIR: tiap PANTAU_DETIK detik folder dipindai (0 = tidak dipantau). Workbook baru
+# didaftarkan lalu dimuat. File baru diproses setelah ukuran & mtime-nya sama di dua pindaian
+# berturut-turut, supaya file yang masih disalin tidak ikut terbaca. Workbook yang dihapus dari
+# folder tetap tampil; datanya sudah ada di database.
+# Setelah diimpor, database (berisi edit dari dashboard) yang jadi sumber data, sama seperti saat
+# server start: workbook yang isinya (hash) kemudian berubah TIDAK diimpor ulang, hanya diberi peringatan.
+# Untuk menimpa data dengan isi workbook, upload lewat dashboard dengan centang 'Ganti data'.
+PANTAU_DETIK = float(os.environ.get("SUPERVISI_PANTAU_DETIK", "5"))
+
+def _stat_file(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+_stat_terlihat = {path: _stat_file(path) for files in dataset_files.values() for path in files.values()}
+_stat_dipakai = dict(_stat_terlihat)  # path -> (size, mtime_ns) isi file yang sudah dimuat/diimpor
+
+def workbook_berubah(jenis, tahun, path):
+    # Isi workbook dibandingkan dengan hash saat terakhir diimpor; mtime saja bisa berubah tanpa isinya
+    # berubah (disalin ulang, disimpan tanpa edit, atau dipindah ke sini oleh upload 'Ganti data')
+    try:
+        return sha256_dataset_db(jenis, tahun) not in (None, _hash_file(path))
+    except OSError:
+        return False
+
+def peringatan_workbook_berubah(jenis, tahun):
+    print(f"⚠️ Workbook {jenis} {tahun} berubah tetapi tidak diimpor ulang; data di database tetap dipakai. "
+          f"Upload dengan centang 'Ganti data' untuk menimpanya.")
+
+def daftarkan_dataset_baru(baru):
+    # baru: [(jenis, tahun, path)] yang belum ada di dataset_files
+    global dataset_files
+    if not baru:
+        return
+    with _muat_lock:
+        gabungan = {jenis: dict(files) for jenis, files in dataset_files.items()}
+        for jenis, tahun, path in baru:
+            datasets.setdefault(jenis, {})
+            gabungan.setdefault(jenis, {})[tahun] = path
+        # Diganti utuh: thread lain yang sedang mengiterasi daftar lama tidak terganggu
+        dataset_files = gabungan
+    for jenis, tahun, path in baru:
+        print(f"Workbook baru ditemukan: {jenis} {tahun}")
+        if not MUAT_LAZY:
+            muat_dataset(jenis, tahun)
+
+def pindai_data_dir():
+    baru, berubah = [], []
+    for jenis, files in temukan_dataset_files(DATA_DIR).items():
+        for tahun, path in files.items():
+            stat = _stat_file(path)
+            if stat is None or stat != _stat_terlihat.get(path):
+                _stat_terlihat[path] = stat  # Baru muncul atau masih ditulis, cek lagi di pindaian berikutnya
+                continue
+            if stat == _stat_dipakai.get(path):
+                continue
+            _stat_dipakai[path] = stat
+            (berubah if tahun in dataset_files.get(jenis, {}) else baru).append((jenis, tahun, path))
+
+    daftarkan_dataset_baru(baru)
+    for jenis, tahun, path in berubah:
+        if workbook_berubah(jenis, tahun, path):
+            peringatan_workbook_berubah(jenis, tahun)
+
+# Upload workbook dari dashboard: isi file ditulis ke nama sementara di DATA_DIR, divalidasi dan
+# diimpor ke database, baru dipindah ke nama akhirnya supaya pemantau folder tidak membaca file setengah jadi
+MAKS_UPLOAD_MB = float(os.environ.get("SUPERVISI_MAKS_UPLOAD_MB", "50"))
+
+def path_workbook(jenis, tahun):
+    # None kalau jenis/tahun tidak membentuk nama workbook yang sah
+    nama = f"{jenis} {tahun}.xlsx"
+    return os.path.join(DATA_DIR, nama) if _pola_file_dataset.match(nama) else None
+
+def impor_workbook_upload(nama_file, isi, ganti=False):
+    # Kembalikan (jenis, tahun); ValueError kalau nama file atau isinya tidak bisa dipakai
+    cocok = _pola_file_dataset.match(os.path.basename(nama_file or ""))
+    if not cocok:
+        raise ValueError("nama file harus berbentuk 'Penilaian <jenis> <yyyy-yyyy>.xlsx'")
+    jenis, tahun = cocok.groups()
+    if not ganti and (versi_dataset_db(jenis, tahun) is not None or os.path.exists(path_workbook(jenis, tahun))):
+        raise ValueError(f"data {jenis} {tahun} sudah ada, centang 'Ganti data' untuk menimpanya")
+    tmp_path = os.path.join(DATA_DIR, f".upload-{os.getpid()}-{threading.get_ident()}.xlsx")
+    with open(tmp_path, "wb") as f:
+        f.write(isi)
+    try:
+        df = load_and_process(tmp_path, tahun, jenis)
+        if df.empty:
+            raise ValueError("tidak ada baris nilai yang terbaca")
+        hasil = impor_dataset_db(jenis, tahun, df, sumber=path_workbook(jenis, tahun), sha256=_hash_file(tmp_path),
+                                 ganti=ganti)
+        if hasil is None and not ganti:
+            raise ValueError(f"data {jenis} {tahun} sudah ada, centang 'Ganti data' untuk menimpanya")
+        os.replace(tmp_path, path_workbook(jenis, tahun))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return jenis, tahun
+
+def pantau_data_dir():
+    while True:
+        time.sleep(PANTAU_DETIK)
+        try:
+            pindai_data_dir()
+        except Exception as e:
+            print(f"Gagal memindai {DATA_DIR}: {e}")
+
+# Proses anak di pool ikut mengimport modul ini (sebagai __mp_main__ kalau dijalankan
+# langsung), jangan sampai ikut memuat semua dataset
+if __name__ != "__mp_main__" and multiprocessing.parent_process() is None:
+    if not MUAT_LAZY:
+        for _jenis, _files in dataset_files.items():
+            for _tahun in _files:
+                muat_dataset(_jenis, _tahun)
+    if PANTAU_DETIK > 0:
+        threading.Thread(target=pantau_data_dir, name="pantau-data-dir", daemon=True).start()
+
+def _tunggu_semua_dataset():
+    for jenis, files in dataset_files.items():
+        for tahun in files:
+            get_dataset(jenis, tahun, tunggu=True)
+
+def cek_username(nama_user):
+    # True/False; None kalau belum bisa dipastikan karena masih ada dataset yang dimuat. Login tidak
+    # menunggu di sini: dataset yang belum dimuat dikirim ke pool, index menyusul, user diminta coba lagi
+    if nama_user in username_index:
+        return True
+    memuat = False
+    for jenis, files in dataset_files.items():
+        for tahun in files:
+            if datasets.get(jenis, {}).get(tahun) is not None:
+                continue
+            future = muat_dataset(jenis, tahun)
+            if future.done():
+                _selesai_muat(jenis, tahun, future)
+            else:
+                memuat = True
+    if nama_user in username_index:
+        return True
+    return None if memuat else False
+
+# Kubus nilai lintas tahun per jenis: array (guru, indikator, periode, tahun) berisi Nilai, NaN kalau
+# tidak ada. Dibangun ulang hanya kalau ada dataset tahun itu yang berubah/selesai dimuat; tren,
+# persentil, rata-rata angkatan dan peningkatan antar tahun ikut dihitung sekali dengan operasi array.
+_kubus = {}  # jenis -> dict hasil bangun_kubus
+_kubus_lock = threading.Lock()
+
+def _sumbu_kubus(frames, kolom):
+    # Kode kategori tiap frame dipetakan ke kamus bersama lalu dipadatkan jadi 0..n-1 urut abjad.
+    # Kembalikan (nilai sumbu, [posisi di sumbu untuk tiap baris, per frame])
+    kamus = _kategori[kolom]
+    kode = [kamus.get_indexer(df[kolom].cat.categories)[df[kolom].cat.codes.to_numpy()] for df in frames]
+    dipakai = np.zeros(len(kamus), dtype=bool)
+    for k in kode:
+        dipakai[k] = True
+    unik = np.flatnonzero(dipakai)
+    nilai = kamus[unik].to_numpy(dtype=object)
+    urut = np.argsort(nilai, kind="stable")
+    peta = np.empty(len(kamus), dtype=np.intp)
+    peta[unik[urut]] = np.arange(len(unik))
+    return nilai[urut], [peta[k] for k in kode]
+
+def _bagi(jumlah, banyak):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(banyak > 0, jumlah / banyak, np.nan)
+
+def _persentil(rata2):
+    # Peringkat persentil per tahun (kolom) di antara guru yang punya nilai; seri dapat nilai tengah
+    hasil = np.full(rata2.shape, np.nan)
+    for t in range(rata2.shape[1]):
+        ada = ~np.isnan(rata2[:, t])
+        urut = np.sort(rata2[ada, t])
+        if urut.size:
+            kiri = np.searchsorted(urut, rata2[ada, t], "left")
+            kanan = np.searchsorted(urut, rata2[ada, t], "right")
+            hasil[ada, t] = (kiri + kanan) / 2 / urut.size * 100
+    return hasil
+
+@waktu_pandas()
+def bangun_kubus(jenis, tahun_list):
+    frames = [datasets[jenis][t] for t in tahun_list]
+    guru, kode_guru = _sumbu_kubus(frames, "Nama Guru Normalized")
+    indikator, kode_indikator = _sumbu_kubus(frames, "Indikator")
+    periode, kode_periode = _sumbu_kubus(frames, "Periode")
+
+    nilai = np.full((len(guru), len(indikator), len(periode), len(tahun_list)), np.nan)
+    nama = np.empty(len(guru), dtype=object)
+    for t, df in enumerate(frames):
+        nilai[kode_guru[t], kode_indikator[t], kode_periode[t], t] = pd.to_numeric(df["Nilai"], errors="coerce").to_numpy()
+        nama[kode_guru[t]] = df["Nama Guru"].to_numpy(dtype=object)  # Nama tampilan dari tahun terbaru
+    ada = ~np.isnan(nilai)
+    nol = np.where(ada, nilai, 0.0)
+
+    # Rata-rata per guru per tahun (semua indikator & periode), lalu per sekolah dan per indikator
+    jumlah_guru, banyak_guru = nol.sum(axis=(1, 2)), ada.sum(axis=(1, 2))
+    rata2 = _bagi(jumlah_guru, banyak_guru)
+    rata2_sekolah = _bagi(jumlah_guru.sum(axis=0), banyak_guru.sum(axis=0))
+    rata2_indikator = _bagi(nol.sum(axis=(0, 2)), ada.sum(axis=(0, 2)))
+
+    # Tren: kemiringan regresi linear rata-rata guru terhadap tahun ajaran (poin per tahun)
+    x = np.array([int(t[:4]) for t in tahun_list], dtype=float)
+    punya = banyak_guru > 0
+    n = punya.sum(axis=1)
+    x_rata = _bagi(np.where(punya, x, 0.0).sum(axis=1), n)
+    y_rata = _bagi(np.where(punya, rata2, 0.0).sum(axis=1), n)
+    dx = np.where(punya, x - x_rata[:, None], 0.0)
+    dy = np.where(punya, rata2 - y_rata[:, None], 0.0)
+    tren = np.where(n >= 2, _bagi((dx * dy).sum(axis=1), (dx ** 2).sum(axis=1)), np.nan)
+
+    # Peningkatan dibanding tahun sebelumnya yang ada di data
+    peningkatan = np.full(rata2.shape, np.nan)
+    peningkatan[:, 1:] = rata2[:, 1:] - rata2[:, :-1]
+
+    # Angkatan = tahun pertama guru punya nilai; rata-rata tiap angkatan per tahun lewat perkalian matriks
+    angkatan = np.where(punya.any(axis=1), punya.argmax(axis=1), -1)
+    anggota = (angkatan[None, :] == np.arange(len(tahun_list))[:, None]).astype(float)
+    rata2_angkatan = _bagi(anggota @ np.where(punya, rata2, 0.0), anggota @ punya.astype(float))
+
+    return {
+        "tahun": list(tahun_list), "guru": guru, "nama": nama, "indikator": list(indikator), "periode": list(periode),
+        "posisi": {g: i for i, g in enumerate(guru)}, "nilai": nilai, "ada": ada,
+        "rata2": rata2, "rata2_sekolah": rata2_sekolah, "rata2_indikator": rata2_indikator, "tren": tren,
+        "persentil": _persentil(rata2), "peningkatan": peningkatan, "angkatan": angkatan, "rata2_angkatan": rata2_angkatan,
+    }
 
-app = Dash(__name__, suppress_callback_exceptions=True)
+def get_kubus(jenis):
+    # Memakai tahun yang sudah siap saja (None kalau belum ada); kunci berubah kalau ada tahun baru
+    # atau edit tersimpan
+    tahun_list = sorted(datasets.get(jenis, {}))
+    if not tahun_list:
+        return None
+    kunci = tuple((t, dataset_versi.get((jenis, t))) for t in tahun_list)
+    kubus = _kubus.get(jenis)
+    if kubus is not None and kubus["kunci"] == kunci:
+        return kubus
+    with _kubus_lock:
+        kubus = _kubus.get(jenis)
+        if kubus is None or kubus["kunci"] != kunci:
+            kubus = bangun_kubus(jenis, tahun_list)
+            kubus["kunci"] = kunci
+            _kubus[jenis] = kubus
+    return kubus
+
+# Kompresi response: dengan flask-compress (pip install "dash[compress]") gzip/brotli sesuai
+# Accept-Encoding browser, tanpa itu cukup gzip lewat hook after_request di bawah.
+try:
+    import flask_compress
+except ImportError:
+    flask_compress = None
+
+app = Dash(__name__, suppress_callback_exceptions=True, compress=flask_compress is not None)
 app.title = "Supervisi Guru Dashboard"
+server = app.server  # untuk gunicorn: gunicorn -w 4 app:server
+
+KOMPRES_MIN_BYTE = 500
+KOMPRES_MIMETYPE = {"application/json", "application/javascript", "text/javascript", "text/html", "text/css",
+                    "text/plain"}
+
+if flask_compress is None:
+    # Didaftarkan paling awal supaya jalan paling akhir (Flask memanggil after_request terbalik),
+    # jadi /metrics tetap mencatat ukuran sebelum dikompres
+    @server.after_request
+    def _gzip_response(response):
+        if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+                or "Content-Encoding" in response.headers or response.mimetype not in KOMPRES_MIMETYPE):
+            return response
+        response.vary.add("Accept-Encoding")
+        if "gzip" not in request.headers.get("Accept-Encoding", ""):
+            return response
+        data = response.get_data()
+        if len(data) < KOMPRES_MIN_BYTE:
+            return response
+        response.set_data(gzip.compress(data, compresslevel=6))
+        response.headers["Content-Encoding"] = "gzip"
+        etag, lemah = response.get_etag()
+        if etag:
+            # ETag harus beda untuk representasi yang dikompres (akhiran sama dengan flask-compress)
+            response.set_etag(etag + ":gzip", weak=lemah)
+        return response
+
+# Instrumentasi callback: waktu total, waktu pandas, ukuran request & response per callback,
+# disajikan sebagai histogram format teks Prometheus di /metrics (angkanya per proses worker).
+# SUPERVISI_LOG_LAMBAT_MS=500 mencetak callback yang lebih lambat dari 500 ms beserta pemicunya.
+BATAS_LAMBAT_MS = float(os.environ.get("SUPERVISI_LOG_LAMBAT_MS", "0"))
+BUCKET_DETIK = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKET_BYTE = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+METRIK = {
+    "supervisi_callback_seconds": ("Waktu total request callback.", BUCKET_DETIK),
+    "supervisi_callback_pandas_seconds": ("Waktu di kode pandas selama request callback.", BUCKET_DETIK),
+    "supervisi_callback_request_bytes": ("Ukuran body request callback.", BUCKET_BYTE),
+    "supervisi_callback_response_bytes": ("Ukuran body response callback.", BUCKET_BYTE),
+}
+_histogram = {nama: {} for nama in METRIK}  # nama -> {callback: [hitungan kumulatif per bucket..., sum, count]}
+_metrik_lock = threading.Lock()
+
+def catat_histogram(nama, callback, nilai):
+    batas = METRIK[nama][1]
+    with _metrik_lock:
+        h = _histogram[nama].setdefault(callback, [0] * len(batas) + [0.0, 0])
+        for i, b in enumerate(batas):
+            if nilai <= b:
+                h[i] += 1
+        h[-2] += nilai
+        h[-1] += 1
+
+def _role_dari_request(body):
+    for item in body.get("inputs", []) + body.get("state", []):
+        if isinstance(item, dict) and item.get("id") == "session-store":
+            return (item.get("value") or {}).get("role")
+    return None
+
+@server.before_request
+def _mulai_ukur_callback():
+    if request.path.endswith("/_dash-update-component"):
+        g.mulai_callback = time.perf_counter()
+        _pandas_local.total = 0.0
+
+@server.after_request
+def _selesai_ukur_callback(response):
+    mulai = g.pop("mulai_callback", None)
+    if mulai is None:
+        return response
+    durasi = time.perf_counter() - mulai
+    body = request.get_json(silent=True) or {}
+    output = body.get("output", "")
+    callback = getattr(app.callback_map.get(output, {}).get("callback"), "__name__", output)
+    ukuran_request = request.content_length or 0
+    ukuran_response = response.calculate_content_length() or 0
+    catat_histogram("supervisi_callback_seconds", callback, durasi)
+    catat_histogram("supervisi_callback_pandas_seconds", callback, _pandas_local.total)
+    catat_histogram("supervisi_callback_request_bytes", callback, ukuran_request)
+    catat_histogram("supervisi_callback_response_bytes", callback, ukuran_response)
+    if BATAS_LAMBAT_MS and durasi * 1000 >= BATAS_LAMBAT_MS:
+        print(f"🐢 Callback lambat: {callback} {durasi * 1000:.0f} ms (pandas {_pandas_local.total * 1000:.0f} ms), "
+              f"pemicu {body.get('changedPropIds')}, role {_role_dari_request(body)}, "
+              f"request {ukuran_request} B, response {ukuran_response} B")
+    return response
+
+@server.route("/metrics")
+def metrics():
+    baris = []
+    with _metrik_lock:
+        for nama, (keterangan, batas) in METRIK.items():
+            baris += [f"# HELP {nama} {keterangan}", f"# TYPE {nama} histogram"]
+            for callback, h in sorted(_histogram[nama].items()):
+                for b, n in zip(batas, h):
+                    baris.append(f'{nama}_bucket{{callback="{callback}",le="{b}"}} {n}')
+                baris.append(f'{nama}_bucket{{callback="{callback}",le="+Inf"}} {h[-1]}')
+                baris.append(f'{nama}_sum{{callback="{callback}"}} {h[-2]}')
+                baris.append(f'{nama}_count{{callback="{callback}"}} {h[-1]}')
+    baris += ["# HELP supervisi_dataset_memory_bytes Memori DataFrame per dataset.",
+              "# TYPE supervisi_dataset_memory_bytes gauge"]
+    for (jenis, tahun), n in sorted(pemakaian_memori().items()):
+        baris.append(f'supervisi_dataset_memory_bytes{{jenis="{jenis}",tahun="{tahun}"}} {n}')
+    return Response("\n".join(baris) + "\n", mimetype="text/plain; version=0.0.4")
+
+@server.before_request
+def _segarkan_sebelum_request():
+    # Aset statis, /metrics dan sejenisnya tidak membaca dataset, jadi tidak perlu menunggu pemuatan ulang
+    if request.path.endswith("/_dash-update-component") or request.path.startswith("/api/"):
+        try:
+            segarkan_dataset()
+        except (sqlite3.Error, OSError) as e:
+            # Dataset lama tetap dilayani; penanda belum diperbarui, jadi request berikutnya mencoba lagi
+            print(f"⚠️ Gagal memeriksa versi dataset: {e}")
+
+# API JSON read-only untuk sistem sekolah lain: angka yang sama dengan kartu ringkasan, daftar guru,
+# dan nilai per indikator satu guru, langsung dari dataset di memori.
+#   GET /api/dataset
+#   GET /api/<jenis>/<tahun>/ringkasan
+#   GET /api/<jenis>/<tahun>/guru
+#   GET /api/<jenis>/<tahun>/guru/<nama guru>
+# ETag kuat diturunkan dari versi database dataset (sama di semua worker), jadi poller yang mengirim
+# If-None-Match cukup dijawab 304 tanpa membangun isinya. SUPERVISI_API_TOKEN mewajibkan header
+# "Authorization: Bearer <token>". Nilai per guru (dua endpoint /guru) tidak pernah dibuka tanpa token:
+# kalau SUPERVISI_API_TOKEN tidak di-set, endpoint itu menjawab 503.
+API_VERSI = 1  # Naikkan kalau bentuk response API berubah
+API_TOKEN = os.environ.get("SUPERVISI_API_TOKEN")
+API_BUTUH_TOKEN = {"api_daftar_guru", "api_guru"}
+
+def _galat_api(status, pesan):
+    return Response(json.dumps({"error": pesan}), status=status, mimetype="application/json")
+
+@server.before_request
+def _cek_token_api():
+    if not API_TOKEN and request.endpoint in API_BUTUH_TOKEN:
+        return _galat_api(503, "Endpoint nilai guru dimatikan; set SUPERVISI_API_TOKEN untuk memakainya")
+    if API_TOKEN and request.path.startswith("/api/"):
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {API_TOKEN}"):
+            return _galat_api(401, "Token API tidak valid")
+
+def _angka_api(nilai):
+    return None if nilai is None or pd.isna(nilai) else float(nilai)
+
+def _etag_api(*bagian):
+    return hashlib.sha1("|".join(str(b) for b in (API_VERSI,) + bagian).encode("utf-8")).hexdigest()
+
+def _etag_cocok(etag):
+    # Tag yang disimpan cache bisa berakhiran :gzip / :br dari kompresi response; kembalikan tag itu
+    if request.if_none_match.star_tag:
+        return etag
+    for tag in request.if_none_match.as_set(include_weak=True):
+        if tag.split(":")[0] == etag:
+            return tag
+    return None
+
+def _respon_api(etag, buat_isi):
+    tag = _etag_cocok(etag)
+    if tag:
+        return Response(status=304, headers={"ETag": f'"{tag}"', "Cache-Control": "no-cache"})
+    response = Response(json.dumps(buat_isi(), ensure_ascii=False), mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"  # Boleh disimpan, tapi selalu divalidasi ulang
+    return response
+
+def _pastikan_dataset_api(jenis, tahun):
+    if tahun not in dataset_files.get(jenis, {}):
+        abort(_galat_api(404, f"Dataset {jenis} {tahun} tidak ditemukan"))
+    if get_dataset(jenis, tahun) is None:
+        response = _galat_api(503, f"Dataset {jenis} {tahun} masih dimuat")
+        response.headers["Retry-After"] = "2"
+        abort(response)
+
+@server.route("/api/dataset")
+def api_dataset():
+    daftar = [(jenis, tahun, versi_db_lokal.get((jenis, tahun)))
+              for jenis, files in dataset_files.items() for tahun in sorted(files)]
+    return _respon_api(_etag_api("dataset", *daftar), lambda: {
+        "dataset": [{"jenis": jenis, "tahun": tahun, "siap": versi is not None, "versi": versi}
+                    for jenis, tahun, versi in daftar]})
+
+@server.route("/api/<jenis>/<tahun>/ringkasan")
+def api_ringkasan(jenis, tahun):
+    _pastikan_dataset_api(jenis, tahun)
+    with baca_dataset(jenis, tahun):
+        versi = versi_db_lokal.get((jenis, tahun))
+
+        def isi():
+            agg = agregat[(jenis, tahun)]
+            kartu = hitung_kartu(jenis, tahun)
+            return {
+                "jenis": jenis, "tahun": tahun, "versi": versi,
+                "total_guru": kartu["total_guru"],
+                "rata_rata": _angka_api(kartu["rata_rata"]),
+                "top_indikator": kartu["top_indikator"],
+                "bottom_indikator": kartu["bottom_indikator"],
+                "top_guru": kartu["top_guru"],
+                "best_improve": None if kartu["best_improve"] == "—" else kartu["best_improve"],
+                "rata_rata_indikator": {k: _angka_api(_rata2(v)) for k, v in sorted(agg["indikator"].items())},
+                "rata_rata_periode": {k: _angka_api(_rata2(v)) for k, v in sorted(agg["periode"].items())},
+            }
+
+        return _respon_api(_etag_api("ringkasan", jenis, tahun, versi), isi)
+
+@server.route("/api/<jenis>/<tahun>/guru")
+def api_daftar_guru(jenis, tahun):
+    _pastikan_dataset_api(jenis, tahun)
+    with baca_dataset(jenis, tahun):
+        versi = versi_db_lokal.get((jenis, tahun))
+
+        def isi():
+            agg = agregat[(jenis, tahun)]
+            return {"jenis": jenis, "tahun": tahun, "versi": versi, "guru": [{
+                "nama": nama,
+                "rata_rata": _angka_api(_rata2(agg["guru"].get(nama))),
+                "rata_1st": _angka_api(_rata2(agg["guru_periode"].get((nama, "1st")))),
+                "rata_2nd": _angka_api(_rata2(agg["guru_periode"].get((nama, "2nd")))),
+            } for nama in sorted(agg["baris_guru"])]}
+
+        return _respon_api(_etag_api("guru", jenis, tahun, versi), isi)
+
+@server.route("/api/<jenis>/<tahun>/guru/<path:nama>")
+def api_guru(jenis, tahun, nama):
+    _pastikan_dataset_api(jenis, tahun)
+    with baca_dataset(jenis, tahun):
+        versi = versi_db_lokal.get((jenis, tahun))
+        rows = baris_guru(jenis, tahun, normalisasi_nama(nama))
+        # Nama boleh ditulis tanpa memperhatikan spasi/huruf besar; kalau ada yang persis sama, itu yang dipakai
+        persis = rows["Nama Guru"] == nama
+        if persis.any():
+            rows = rows[persis]
+        if rows.empty:
+            return _galat_api(404, f"Guru {nama} tidak ada di {jenis} {tahun}")
+
+        def isi():
+            nilai = {}
+            for indikator, periode, n in rows[["Indikator", "Periode", "Nilai"]].itertuples(index=False):
+                nilai.setdefault(indikator, {})[periode] = _angka_api(n)
+            return {"jenis": jenis, "tahun": tahun, "versi": versi, "guru": sorted(set(rows["Nama Guru"])),
+                    "ringkasan": ringkasan_guru(rows), "nilai_indikator": dict(sorted(nilai.items()))}
+
+        return _respon_api(_etag_api("guru", jenis, tahun, versi, normalisasi_nama(nama), nama), isi)
 
 card_style = lambda color: {
     "flex": "1", "backgroundColor": color, "color": "white", "padding": "20px",
@@ -119,6 +1769,12 @@ card_style = lambda color: {
 
 app.layout = html.Div([
     dcc.Store(id='session-store', storage_type='session'),
+    dcc.Store(id='dataset-status'),
+    dcc.Store(id='data-versi'),
+    # Daftar tahun per jenis ikut dikirim bersama layout, jadi pilihan tahun diisi di browser.
+    # Diperbarui update_dataset_status kalau pemantau folder menemukan workbook baru.
+    dcc.Store(id='tahun-per-jenis', data={jenis: sorted(files) for jenis, files in dataset_files.items()}),
+    dcc.Interval(id='dataset-poll', interval=1000),
 
     html.Div(id='login-section', children=[
         html.H2("🔐 Login Dashboard", style={"textAlign": "center", "color": "#2c3e50", "marginTop": "40px"}),
@@ -160,21 +1816,35 @@ app.layout = html.Div([
 
         html.Div([
             html.Label("📂 Pilih Jenis Penilaian:", style={"fontWeight": "bold", "marginTop": "10px"}),
-            dcc.Dropdown(id='jenis-dropdown', options=[{'label': k, 'value': k} for k in datasets.keys()],
-                         value='Penilaian Rencana Pelaksanaan Pembelajaran', style={"marginBottom": "20px"}),
+            dcc.Dropdown(id='jenis-dropdown', options=[{'label': k, 'value': k} for k in dataset_files.keys()],
+                         value=next(iter(dataset_files), None), style={"marginBottom": "20px"}),
             html.Label("📅 Pilih Tahun Supervisi:", style={"fontWeight": "bold"}),
             dcc.RadioItems(id='tahun-radio', inline=True, style={"marginBottom": "20px"}),
             html.Label("🔍 Pilih Guru:", style={"fontWeight": "bold"}),
-            dcc.Dropdown(id='guru-dropdown', placeholder="Pilih Nama Guru", style={"marginBottom": "30px"})
+            dcc.Dropdown(id='guru-dropdown', placeholder="Pilih Nama Guru", search_order="original",
+                         style={"marginBottom": "30px"}),
+            dcc.Store(id='guru-cari')
         ], style={"padding": "0px 30px"}),
 
         dcc.Graph(id='bar-chart'),
 
+        html.Div([
+            html.Label("📈 Tren Lintas Tahun:", style={"fontWeight": "bold"}),
+            dcc.RadioItems(id='tren-mode', inline=True, value='rata2', options=[
+                {'label': 'Rata-rata', 'value': 'rata2'},
+                {'label': 'Persentil', 'value': 'persentil'},
+                {'label': 'Per Indikator', 'value': 'indikator'},
+                {'label': 'Peningkatan antar Tahun', 'value': 'peningkatan'},
+            ], inputStyle={"marginRight": "5px", "marginLeft": "15px"}),
+        ], style={"padding": "0px 30px"}),
+        dcc.Graph(id='trend-chart'),
+
         html.H3("📝 Edit Data Nilai (Admin Only):", style={"marginTop": "40px", "marginBottom": "20px", "color": "#2c3e50"}),
 
         dcc.Input(
             id="search-guru",
             type="text",
+            debounce=0.3,  # Kirim ke server setelah berhenti mengetik, bukan tiap tombol
             placeholder="🔍 Cari Nama Guru",
             style={"marginBottom": "20px", "padding": "12px", "width": "100%", "borderRadius": "8px", "border": "1px solid #ccc"}
         ),
@@ -184,7 +1854,14 @@ app.layout = html.Div([
             editable=True,
             row_selectable="single",
             selected_rows=[],
+            page_current=0,
             page_size=10,
+            page_action="custom",
+            filter_action="custom",
+            filter_query="",
+            sort_action="custom",
+            sort_mode="multi",
+            sort_by=[],
             style_table={"overflowX": "auto"},
             style_cell={"padding": "10px", "textAlign": "left"},
             style_header={"backgroundColor": "#ecf0f1", "fontWeight": "bold"}
@@ -216,21 +1893,14 @@ app.layout = html.Div([
 
             dcc.Dropdown(
                 id="input-jenis",
-                options=[
-                    {"label": "Penilaian Rencana Pelaksanaan Pembelajaran", "value": "Penilaian Rencana Pelaksanaan Pembelajaran"},
-                    {"label": "Penilaian Pelaksanaan Pembelajaran", "value": "Penilaian Pelaksanaan Pembelajaran"},
-                ],
+                options=[{"label": k, "value": k} for k in dataset_files.keys()],
                 placeholder="Pilih Jenis Penilaian",
                 style={'width': '100%', 'margin': '5px 0', "padding": "10px"}
             ),
 
             dcc.RadioItems(
                 id="input-tahun",
-                options=[
-                    {"label": "2020-2021", "value": "2020-2021"},
-                    {"label": "2022-2023", "value": "2022-2023"},
-                    {"label": "2023-2024", "value": "2023-2024"},
-                ],
+                options=[{"label": t, "value": t} for t in sorted({t for files in dataset_files.values() for t in files})],
                 labelStyle={'display': 'inline-block', 'marginRight': '15px'},
                 inputStyle={"margin-right": "5px"},
                 style={"marginTop": "10px", "marginBottom": "15px"}
@@ -248,21 +1918,115 @@ app.layout = html.Div([
                                    "border": "none", "borderRadius": "6px", "float": "right"})
             ], style={"marginTop": "20px", "marginBottom": "30px"}),
 
-            html.Div(id="save-status", style={"marginTop": "10px", "color": "green"})
+            html.Div(id="save-status", style={"marginTop": "10px", "color": "green"}),
+
+            html.H4("📤 Unggah Workbook", style={"marginTop": "40px", "color": "#2c3e50"}),
+            html.Small("Nama file: Penilaian <jenis> <yyyy-yyyy>.xlsx, boleh beberapa file sekaligus."),
+            dcc.Upload(
+                id="upload-data",
+                multiple=True,
+                accept=".xlsx",
+                max_size=int(MAKS_UPLOAD_MB * 1024 * 1024),
+                children=html.Div(["Seret file ke sini atau ", html.A("pilih file")]),
+                style={"width": "100%", "height": "60px", "lineHeight": "60px", "borderWidth": "1px",
+                       "borderStyle": "dashed", "borderRadius": "8px", "textAlign": "center", "marginTop": "10px"}
+            ),
+            dcc.Checklist(id="upload-ganti", options=[{"label": " Ganti data tahun yang sudah ada", "value": "ganti"}],
+                          value=[], style={"marginTop": "10px"}),
+            html.Progress(id="upload-progress", value="0", max="1", style={"width": "100%", "marginTop": "10px"}),
+            html.Div(id="upload-progress-teks"),
+            html.Div(id="upload-status", style={"marginTop": "10px"}),
+            dcc.Store(id="upload-hasil"),
+
+            html.H4("📑 Ekspor Laporan Guru", style={"marginTop": "40px", "color": "#2c3e50"}),
+            html.Small("Grafik & ringkasan semua guru untuk jenis dan tahun yang sedang dipilih, dalam satu file zip."),
+            dcc.RadioItems(
+                id="ekspor-format",
+                options=[{"label": " HTML", "value": "html"},
+                         {"label": " PNG", "value": "png", "disabled": kaleido is None}],
+                value="html",
+                labelStyle={'display': 'inline-block', 'marginRight': '15px'},
+                style={"marginTop": "10px"}
+            ),
+            html.Button("📑 Ekspor Laporan", id="ekspor-button", n_clicks=0,
+                        style={"height": "40px", 'width': '200px', "marginTop": "10px", "backgroundColor": "#8e44ad",
+                               "color": "white", "border": "none", "borderRadius": "6px"}),
+            html.Progress(id="ekspor-progress", value="0", max="1", style={"width": "100%", "marginTop": "10px"}),
+            html.Div(id="ekspor-status", style={"marginTop": "10px"}),
+            dcc.Download(id="ekspor-download")
         ], style={"maxWidth": "600px", "margin": "auto"})
     ]
 )
     ])
 ])
 
-@app.callback(
+# Callback yang hanya memetakan nilai store/dropdown ke style & options dijalankan di browser,
+# tanpa round trip ke server
+app.clientside_callback(
+    """
+    function(jenis, tahunPerJenis, tahunSekarang) {
+        const tahunList = (tahunPerJenis || {})[jenis] || [];
+        // Daftar tahun bertambah (workbook baru): pilihan yang sedang dibuka jangan direset
+        const triggered = window.dash_clientside.callback_context.triggered.map(t => t.prop_id);
+        if (triggered.includes('tahun-per-jenis.data') && tahunList.includes(tahunSekarang)) {
+            return [tahunList.map(t => ({label: t, value: t})), window.dash_clientside.no_update];
+        }
+        return [tahunList.map(t => ({label: t, value: t})), tahunList.length ? tahunList[0] : null];
+    }
+    """,
     Output('tahun-radio', 'options'),
     Output('tahun-radio', 'value'),
-    Input('jenis-dropdown', 'value')
+    Input('jenis-dropdown', 'value'),
+    Input('tahun-per-jenis', 'data'),
+    State('tahun-radio', 'value')
+)
+
+app.clientside_callback(
+    """
+    function(tahunPerJenis) {
+        const options = Object.keys(tahunPerJenis || {}).map(j => ({label: j, value: j}));
+        return [options, options];
+    }
+    """,
+    Output('jenis-dropdown', 'options'),
+    Output('input-jenis', 'options'),
+    Input('tahun-per-jenis', 'data'),
+    prevent_initial_call=True
+)
+
+app.clientside_callback(
+    """
+    function(jenis, tahunPerJenis) {
+        const daftar = tahunPerJenis || {};
+        const tahunList = jenis ? (daftar[jenis] || []) : [...new Set(Object.values(daftar).flat())].sort();
+        return tahunList.map(t => ({label: t, value: t}));
+    }
+    """,
+    Output('input-tahun', 'options'),
+    Input('input-jenis', 'value'),
+    Input('tahun-per-jenis', 'data'),
+    prevent_initial_call=True
+)
+
+MAKS_OPSI_GURU = 50  # Opsi dropdown guru yang dikirim saat admin mengetik nama
+MIN_HURUF_CARI_GURU = 3  # Ketikan yang lebih pendek cukup disaring browser dari opsi yang sudah ada
+
+# Teks yang diketik di dropdown guru baru dikirim ke server kalau sudah MIN_HURUF_CARI_GURU huruf
+# (atau dikosongkan lagi), jadi tidak ada round trip untuk tiap huruf pertama
+app.clientside_callback(
+    f"""
+    function(teks) {{
+        teks = teks || "";
+        if (teks.length > 0 && teks.length < {MIN_HURUF_CARI_GURU}) {{
+            return window.dash_clientside.no_update;
+        }}
+        return teks;
+    }}
+    """,
+    Output('guru-cari', 'data'),
+    Input('guru-dropdown', 'search_value'),
+    prevent_initial_call=True
 )
-def update_tahun_dropdown(jenis):
-    tahun_list = sorted(datasets[jenis].keys())
-    return [{'label': t, 'value': t} for t in tahun_list], tahun_list[0]
 
 @app.callback(
     Output('guru-dropdown', 'options'),
@@ -270,76 +2034,59 @@ def update_tahun_dropdown(jenis):
     Output('guru-dropdown', 'disabled'),
     Input('jenis-dropdown', 'value'),
     Input('tahun-radio', 'value'),
-    Input('session-store', 'data')
+    Input('session-store', 'data'),
+    Input('dataset-status', 'data'),
+    Input('guru-cari', 'data'),
+    State('guru-dropdown', 'value')
 )
-def update_guru_dropdown(jenis, tahun, session_data):
-    df_ori = datasets[jenis][tahun]
-
+def update_guru_dropdown(jenis, tahun, session_data, dataset_status, search_value=None, guru=None):
     if not session_data or not session_data.get("logged_in"):
         return [], None, True
 
+    df_ori = get_dataset(jenis, tahun)
+    if df_ori is None:
+        return [], None, True  # Masih dimuat, callback jalan lagi saat dataset-status berubah
+
     username = session_data["username"]
     role = session_data["role"]
 
     if role == "admin":
+        if search_value is not None and dash.ctx.triggered_id == 'guru-cari':
+            # Mengetik di dropdown: opsi diambil dari index cari (awalan dulu, lalu mirip), pilihan tetap
+            nama_ada = _nama_per_dataset.get((jenis, tahun), set())
+            nama = [n for n in cari_guru(search_value) if n in nama_ada][:MAKS_OPSI_GURU] if search_value else sorted(nama_ada)
+            if guru and guru not in nama:
+                nama.append(guru)
+            # 'search' diisi teks yang diketik supaya hasil ejaan mirip tidak disaring lagi oleh browser
+            return [{'label': g, 'value': g, 'search': search_value or g} for g in nama], dash.no_update, dash.no_update
         options = [{'label': g, 'value': g} for g in sorted(df_ori["Nama Guru"].unique())]
         return options, None, False
     else:
-        nama_user = username.replace("@ses.com", "").strip().lower()
-
-        df = df_ori.copy()
-        df["Nama Guru Normalized"] = df["Nama Guru"].str.replace(" ", "").str.lower().str.strip()
-
-        match_row = df[df["Nama Guru Normalized"] == nama_user]
+        match_row = baris_guru(jenis, tahun, username_ke_nama(username))
         if not match_row.empty:
             nama_asli = match_row["Nama Guru"].iloc[0]
             return [{'label': nama_asli, 'value': nama_asli}], nama_asli, True
         else:
             return [], None, True
 
+import plotly
 import plotly.graph_objects as go
+from plotly.offline import get_plotlyjs
 
-@app.callback(
-    Output('bar-chart', 'figure'),
-    Input('editable-table', 'data'),
-    Input('jenis-dropdown', 'value'),
-    Input('tahun-radio', 'value'),
-    Input('guru-dropdown', 'value'),
-    Input('session-store', 'data')
-)
-def update_chart_from_table(table_data, jenis, tahun, guru, session_data):
-    if not session_data or not session_data.get("logged_in"):
-        return go.Figure().update_layout(title="Silakan login")
-
-    df = pd.DataFrame(table_data)
-    df.columns = [str(col).strip() for col in df.columns]  # Pastikan tidak ada spasi tersembunyi
-
-    role = session_data["role"]
-    username = session_data["username"]
-
-    if "Nama Guru" not in df.columns:
-        print("Kolom yang tersedia:", df.columns.tolist())
-        return go.Figure().update_layout(title="Kolom 'Nama Guru' tidak ditemukan")
-
-    if role == "admin":
-        if not guru:
-            return go.Figure().update_layout(title="Silakan pilih guru")
-        filtered = df[df["Nama Guru"] == guru]
-    else:
-        nama_guru = username.replace("@ses.com", "").strip().lower()
-        df["Nama Guru Normalized"] = df["Nama Guru"].astype(str).str.replace(" ", "").str.lower().str.strip()
-        filtered = df[df["Nama Guru Normalized"] == nama_guru]
-
-
-    # Filter berdasarkan jenis dan tahun
-    if "Jenis" in filtered.columns and "Tahun" in filtered.columns:
-        filtered = filtered[(filtered["Jenis"] == jenis) & (filtered["Tahun"] == tahun)]
+def buat_grafik_guru(jenis, tahun, nama_normalized, guru=None):
+    # guru diisi untuk admin (nama asli dari dropdown), kosong untuk guru yang login
+    filtered = baris_guru(jenis, tahun, nama_normalized)
+    if guru is not None:
+        filtered = filtered[filtered["Nama Guru"] == guru]
+    return figur_grafik_guru(filtered, tahun)
 
+def figur_grafik_guru(filtered, tahun):
+    # Hanya bergantung pada baris yang diberikan, jadi bisa dipakai juga di worker ekspor
     if filtered.empty:
         return go.Figure().update_layout(title="Tidak ditemukan data guru yang dipilih.")
 
     indikator_order = sorted(filtered["Indikator"].unique())
-    filtered["Indikator"] = pd.Categorical(filtered["Indikator"], categories=indikator_order, ordered=True)
+    filtered = filtered.assign(Indikator=pd.Categorical(filtered["Indikator"], categories=indikator_order, ordered=True))
     filtered = filtered.sort_values("Indikator")
 
     fig = go.Figure()
@@ -361,6 +2108,290 @@ def update_chart_from_table(table_data, jenis, tahun, guru, session_data):
 
     return fig
 
+def grafik_guru(jenis, tahun, nama_normalized, guru=None):
+    kunci = (jenis, tahun, nama_normalized, guru, get_versi_guru(jenis, tahun, nama_normalized))
+    with _cache_grafik_lock:
+        fig = _cache_grafik.get(kunci)
+        if fig is not None:
+            _cache_grafik.move_to_end(kunci)
+            return fig
+    fig = buat_grafik_guru(jenis, tahun, nama_normalized, guru)
+    with _cache_grafik_lock:
+        _cache_grafik[kunci] = fig
+        while len(_cache_grafik) > MAKS_CACHE_GRAFIK:
+            _cache_grafik.popitem(last=False)
+    return fig
+
+# Ekspor laporan: grafik batang & ringkasan tiap guru di satu (jenis, tahun) sebagai file statis.
+# Render dibagi ke process pool; tiap file dicatat di manifest.json bersama hash baris guru itu,
+# jadi ekspor berikutnya hanya merender guru yang datanya berubah.
+EKSPOR_DIR = os.environ.get("SUPERVISI_EKSPOR_DIR", os.path.join(CACHE_DIR, "ekspor"))
+EKSPOR_VERSI = 1  # Naikkan kalau tampilan laporan berubah
+UKURAN_BATCH_EKSPOR = 25  # Guru per tugas pool
+KOLOM_EKSPOR = ["Nama Guru", "Periode", "Tahun", "Indikator", "Nilai"]
+LABEL_RINGKASAN = [("rata_rata", "Rata-rata"), ("rata_1st", "Rata-rata 1st"), ("rata_2nd", "Rata-rata 2nd"),
+                   ("peningkatan", "Peningkatan"), ("top_indikator", "Indikator Terbaik"),
+                   ("bottom_indikator", "Indikator Terlemah")]
+
+def folder_ekspor(jenis, tahun, fmt, dasar=None):
+    return os.path.join(dasar or EKSPOR_DIR, fmt, jenis, tahun)
+
+def _nama_file_guru(nama, fmt):
+    # Nama asli bisa memuat karakter yang tidak boleh di nama file; hash menjaga tetap unik
+    aman = re.sub(r"[^\w.-]+", "_", nama).strip("_")[:60]
+    return f"{aman}-{hashlib.sha1(nama.encode('utf-8')).hexdigest()[:8]}.{fmt}"
+
+def _bulat(nilai):
+    return None if pd.isna(nilai) else round(float(nilai), 2)
+
+def ringkasan_guru(rows):
+    # Kartu ringkasan satu guru, dihitung dari barisnya saja
+    nilai = pd.to_numeric(rows["Nilai"], errors="coerce")
+    per_periode = nilai.groupby(rows["Periode"].astype(str)).mean()
+    per_indikator = nilai.groupby(rows["Indikator"].astype(str)).mean().dropna()
+    rata_1st, rata_2nd = per_periode.get("1st"), per_periode.get("2nd")
+    return {
+        "rata_rata": _bulat(nilai.mean()),
+        "rata_1st": _bulat(rata_1st),
+        "rata_2nd": _bulat(rata_2nd),
+        "peningkatan": _bulat(rata_2nd - rata_1st) if rata_1st is not None and rata_2nd is not None else None,
+        "top_indikator": per_indikator.idxmax() if len(per_indikator) else None,
+        "bottom_indikator": per_indikator.idxmin() if len(per_indikator) else None,
+    }
+
+def _tabel_html(header, baris):
+    isi = "".join("<tr>" + "".join(f"<td>{sel}</td>" for sel in b) + "</tr>" for b in baris)
+    return ("<table><thead><tr>" + "".join(f"<th>{escape(h)}</th>" for h in header)
+            + f"</tr></thead><tbody>{isi}</tbody></table>")
+
+def _halaman_html(judul, isi):
+    return (f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{escape(judul)}</title><style>"
+            "body{font-family:Arial,sans-serif;margin:30px;color:#2c3e50}table{border-collapse:collapse}"
+            "td,th{border:1px solid #ccc;padding:6px 10px;text-align:left}th{background:#ecf0f1}"
+            f"</style></head><body><h2>{escape(judul)}</h2>{isi}</body></html>")
+
+def _sel(nilai):
+    return "—" if nilai is None else escape(str(nilai))
+
+def _tulis_ekspor(path, teks=None, tulis=None):
+    # Ekspor dari dashboard dan ekspor.py bisa menulis folder yang sama bersamaan, jadi nama file
+    # sementara unik per proses & thread; file akhir diganti utuh dengan os.replace
+    sementara = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        if tulis is not None:
+            tulis(sementara)
+        else:
+            with open(sementara, "w", encoding="utf-8") as f:
+                f.write(teks)
+        os.replace(sementara, path)
+    except BaseException:
+        if os.path.exists(sementara):
+            os.remove(sementara)
+        raise
+
+def _render_ekspor_worker(tugas, jenis, tahun, fmt, folder):
+    # Jalan di proses pool. tugas: [(nama, baris guru, nama file)]; hasil: [(nama, ringkasan)]
+    hasil = []
+    for nama, rows, nama_file in tugas:
+        fig = figur_grafik_guru(rows, tahun)
+        ringkasan = ringkasan_guru(rows)
+        path = os.path.join(folder, nama_file)
+        if fmt == "png":
+            _tulis_ekspor(path, tulis=lambda p: fig.write_image(p, format="png", width=900, height=500))
+        else:
+            tabel = _tabel_html([label for _, label in LABEL_RINGKASAN], [[_sel(ringkasan[k]) for k, _ in LABEL_RINGKASAN]])
+            grafik = fig.to_html(full_html=False, include_plotlyjs="directory")
+            _tulis_ekspor(path, _halaman_html(f"{nama} — {jenis} {tahun}", tabel + grafik))
+        hasil.append((nama, ringkasan))
+    return hasil
+
+def _tulis_index_ekspor(folder, jenis, tahun, fmt, guru):
+    kartu = hitung_kartu(jenis, tahun)
+    ringkasan_dataset = _tabel_html(
+        ["Total Guru", "Rata-rata", "Indikator Terbaik", "Indikator Terlemah", "Guru Terbaik", "Peningkatan Terbaik"],
+        [[kartu["total_guru"], _sel(_bulat(kartu["rata_rata"])), _sel(kartu["top_indikator"]),
+          _sel(kartu["bottom_indikator"]), _sel(kartu["top_guru"]), _sel(kartu["best_improve"])]])
+    baris = [[f"<a href='{quote(c['file'])}'>{escape(nama)}</a>"] + [_sel(c["ringkasan"][k]) for k, _ in LABEL_RINGKASAN]
+             for nama, c in sorted(guru.items())]
+    tabel_guru = _tabel_html(["Nama Guru"] + [label for _, label in LABEL_RINGKASAN], baris)
+    _tulis_ekspor(os.path.join(folder, "index.html"),
+                  _halaman_html(f"Laporan {jenis} {tahun}", ringkasan_dataset + "<br>" + tabel_guru))
+
+def ekspor_laporan(jenis, tahun, fmt="html", dasar=None, max_worker=None, progress=None):
+    # Render laporan semua guru di (jenis, tahun) ke folder_ekspor(...); progress(selesai, total) opsional.
+    # Kembalikan {"folder", "total", "dirender", "dari_cache"}
+    if fmt not in ("html", "png"):
+        raise ValueError(f"Format ekspor tidak dikenal: {fmt}")
+    if fmt == "png" and kaleido is None:
+        raise ValueError("Ekspor PNG butuh kaleido (pip install kaleido)")
+    df = get_dataset(jenis, tahun, tunggu=True)
+    if df is None:
+        raise ValueError(f"Data {jenis} {tahun} tidak tersedia")
+    folder = folder_ekspor(jenis, tahun, fmt, dasar)
+    os.makedirs(folder, exist_ok=True)
+
+    manifest_path = os.path.join(folder, "manifest.json")
+    versi = [EKSPOR_VERSI, plotly.__version__]
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    lama = manifest.get("guru", {}) if manifest.get("versi") == versi else {}
+    if fmt == "html" and (not lama or not os.path.exists(os.path.join(folder, "plotly.min.js"))):
+        _tulis_ekspor(os.path.join(folder, "plotly.min.js"), get_plotlyjs())
+
+    # Hash per baris sekali untuk seluruh frame, lalu digabung per guru
+    hash_baris = pd.util.hash_pandas_object(df[KOLOM_EKSPOR], index=False).to_numpy()
+    nilai_kolom = None
+    guru, baru, tugas = {}, {}, []
+    for nama, posisi in df.groupby("Nama Guru", sort=True, observed=True).indices.items():
+        hash_guru = hashlib.sha256(hash_baris[posisi].tobytes()).hexdigest()
+        catatan = lama.get(nama)
+        if catatan and catatan["hash"] == hash_guru and os.path.exists(os.path.join(folder, catatan["file"])):
+            guru[nama] = catatan
+            continue
+        if nilai_kolom is None:
+            # Kolom kategori dikirim sebagai array biasa supaya kategori seluruh dataset tidak ikut di-pickle
+            nilai_kolom = {k: df[k].to_numpy(dtype=object) for k in KOLOM_EKSPOR}
+        baru[nama] = {"hash": hash_guru, "file": _nama_file_guru(nama, fmt)}
+        tugas.append((nama, pd.DataFrame({k: v[posisi] for k, v in nilai_kolom.items()}), baru[nama]["file"]))
+
+    try:
+        if tugas:
+            batch = [tugas[i:i + UKURAN_BATCH_EKSPOR] for i in range(0, len(tugas), UKURAN_BATCH_EKSPOR)]
+            n_worker = min(len(batch), max_worker or MAX_WORKER_MUAT)
+            with ProcessPoolExecutor(max_workers=n_worker, mp_context=_konteks_proses()) as pool:
+                futures = [pool.submit(_render_ekspor_worker, b, jenis, tahun, fmt, folder) for b in batch]
+                selesai = 0
+                for future in as_completed(futures):
+                    hasil = future.result()
+                    for nama, ringkasan in hasil:
+                        guru[nama] = {**baru[nama], "ringkasan": ringkasan}
+                    selesai += len(hasil)
+                    if progress:
+                        progress(selesai, len(tugas))
+    finally:
+        # Yang sudah dirender tetap dicatat walau ada batch yang gagal
+        _tulis_ekspor(manifest_path, json.dumps({"versi": versi, "guru": guru}))
+
+    # Guru yang sudah tidak ada di dataset: buang file lamanya
+    for nama, catatan in lama.items():
+        if nama not in guru and os.path.exists(os.path.join(folder, catatan["file"])):
+            os.remove(os.path.join(folder, catatan["file"]))
+    _tulis_index_ekspor(folder, jenis, tahun, fmt, guru)
+    return {"folder": folder, "total": len(guru), "dirender": len(tugas), "dari_cache": len(guru) - len(tugas)}
+
+def zip_laporan(folder):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as z:
+        for nama in sorted(os.listdir(folder)):
+            if nama != "manifest.json" and not nama.endswith(".tmp"):
+                z.write(os.path.join(folder, nama), nama)
+    return buffer.getvalue()
+
+@app.callback(
+    Output('bar-chart', 'figure'),
+    Input('jenis-dropdown', 'value'),
+    Input('tahun-radio', 'value'),
+    Input('guru-dropdown', 'value'),
+    Input('session-store', 'data'),
+    Input('data-versi', 'data'),
+    Input('dataset-status', 'data')
+)
+def update_chart_from_table(jenis, tahun, guru, session_data, data_versi, dataset_status):
+    # Data grafik diambil dari dataset di server (bukan dikirim balik dari tabel browser);
+    # data-versi berubah setiap kali ada edit tersimpan supaya grafik ikut segar
+    if not session_data or not session_data.get("logged_in"):
+        return go.Figure().update_layout(title="Silakan login")
+
+    role = session_data["role"]
+    username = session_data["username"]
+
+    if get_dataset(jenis, tahun) is None:
+        return go.Figure().update_layout(title="⏳ Memuat data...")
+
+    if role == "admin":
+        if not guru:
+            return go.Figure().update_layout(title="Silakan pilih guru")
+        return grafik_guru(jenis, tahun, normalisasi_nama(guru), guru)
+    return grafik_guru(jenis, tahun, username_ke_nama(username))
+
+def _garis(x, y, nama, **kwargs):
+    return go.Scatter(x=x, y=np.round(y, 2), name=nama, mode="lines+markers", connectgaps=True, **kwargs)
+
+def buat_grafik_tren(kubus, mode, i):
+    # i: baris guru di kubus, None untuk tampilan seluruh sekolah (admin tanpa guru terpilih)
+    tahun = kubus["tahun"]
+    fig = go.Figure().update_layout(plot_bgcolor='white', paper_bgcolor='white', xaxis={"type": "category"})
+    nama = kubus["nama"][i] if i is not None else None
+
+    if mode == "persentil":
+        if i is None:
+            return fig.update_layout(title="Silakan pilih guru untuk melihat persentil")
+        fig.add_trace(_garis(tahun, kubus["persentil"][i], nama))
+        return fig.update_layout(title=f"Peringkat Persentil per Tahun: {nama}", yaxis={"range": [0, 100]})
+
+    if mode == "indikator":
+        if i is None:
+            rata2 = kubus["rata2_indikator"]
+        else:
+            rata2 = _bagi(np.where(kubus["ada"][i], kubus["nilai"][i], 0.0).sum(axis=1), kubus["ada"][i].sum(axis=1))
+        for k, indikator in enumerate(kubus["indikator"]):
+            fig.add_trace(_garis(tahun, rata2[k], indikator))
+        return fig.update_layout(title=f"Rata-rata per Indikator per Tahun: {nama or 'Semua Guru'}")
+
+    if mode == "peningkatan":
+        if i is not None:
+            fig.add_trace(go.Bar(x=tahun[1:], y=np.round(kubus["peningkatan"][i, 1:], 2), name=nama))
+            return fig.update_layout(title=f"Peningkatan Rata-rata dibanding Tahun Sebelumnya: {nama}")
+        # Sepuluh guru dengan peningkatan terbesar di tahun terakhir
+        terakhir = kubus["peningkatan"][:, -1]
+        baris = np.flatnonzero(~np.isnan(terakhir))
+        baris = baris[np.argsort(-terakhir[baris], kind="stable")[:10]][::-1]
+        fig.add_trace(go.Bar(x=np.round(terakhir[baris], 2), y=kubus["nama"][baris], orientation="h"))
+        return fig.update_layout(title=f"Peningkatan Tertinggi {tahun[-2]} → {tahun[-1]}" if len(tahun) > 1
+                                 else "Belum ada tahun sebelumnya untuk dibandingkan")
+
+    fig.add_trace(_garis(tahun, kubus["rata2_sekolah"], "Rata-rata sekolah", line={"dash": "dot"}))
+    if i is None:
+        return fig.update_layout(title="Rata-rata Nilai Sekolah per Tahun")
+    angkatan = kubus["angkatan"][i]
+    if angkatan >= 0:  # -1: guru belum pernah punya nilai, tidak masuk angkatan mana pun
+        fig.add_trace(_garis(tahun, kubus["rata2_angkatan"][angkatan], f"Rata-rata angkatan {tahun[angkatan]}",
+                             line={"dash": "dash"}))
+    fig.add_trace(_garis(tahun, kubus["rata2"][i], nama))
+    judul = f"Rata-rata Nilai per Tahun: {nama}"
+    if not np.isnan(kubus["tren"][i]):
+        judul += f" (tren {kubus['tren'][i]:+.2f} per tahun)"
+    return fig.update_layout(title=judul)
+
+@app.callback(
+    Output('trend-chart', 'figure'),
+    Input('jenis-dropdown', 'value'),
+    Input('guru-dropdown', 'value'),
+    Input('tren-mode', 'value'),
+    Input('session-store', 'data'),
+    Input('data-versi', 'data'),
+    Input('dataset-status', 'data')
+)
+def update_trend_chart(jenis, guru, mode, session_data, data_versi, dataset_status):
+    if not session_data or not session_data.get("logged_in"):
+        return go.Figure().update_layout(title="Silakan login")
+
+    kubus = get_kubus(jenis)
+    if kubus is None:
+        return go.Figure().update_layout(title="⏳ Memuat data...")
+
+    # Guru hanya bisa melihat dirinya sendiri (dibanding rata-rata sekolah & angkatannya)
+    if session_data["role"] == "admin":
+        nama_normalized = normalisasi_nama(guru) if guru else None
+    else:
+        nama_normalized = username_ke_nama(session_data["username"])
+    i = kubus["posisi"].get(nama_normalized)
+    if nama_normalized is not None and i is None:
+        return go.Figure().update_layout(title="Tidak ditemukan data guru yang dipilih.")
+    return buat_grafik_tren(kubus, mode, i)
+
 
 @app.callback(
     Output("card-primary", "children"),
@@ -370,70 +2401,221 @@ def update_chart_from_table(table_data, jenis, tahun, guru, session_data):
     Output("card-best-improve", "children"),
     Output("card-bottom-indikator", "children"),
     Input("jenis-dropdown", "value"),
-    Input("tahun-radio", "value")
+    Input("tahun-radio", "value"),
+    Input("dataset-status", "data")
 )
-def update_cards(jenis, tahun):
-    df = datasets[jenis][tahun]
-    
-    # 🔒 Konversi kolom nilai ke numerik dulu
-    if "Nilai" in df.columns:
-        df["Nilai"] = pd.to_numeric(df["Nilai"], errors="coerce")
-    else:
-        return [dash.no_update] * 3  # atau sesuai jumlah Output di callback
+def update_cards(jenis, tahun, dataset_status):
+    if get_dataset(jenis, tahun) is None:
+        return ("⏳ Memuat data...",) * 6
 
-    
-    total_guru = df[["Nama Guru"]].drop_duplicates().shape[0]
-    rata_rata = df["Nilai"].mean()
-    top_indikator = df.groupby("Indikator")["Nilai"].mean().idxmax()
-    bottom_indikator = df.groupby("Indikator")["Nilai"].mean().idxmin()
-    top_guru = df.groupby("Nama Guru")["Nilai"].mean().idxmax()
-
-    pivot = df.pivot_table(index="Nama Guru", columns="Periode", values="Nilai", aggfunc="mean")
-    pivot["Peningkatan"] = pivot.get("2nd", 0) - pivot.get("1st", 0)
-    best_improve = pivot["Peningkatan"].idxmax() if not pivot["Peningkatan"].isna().all() else "—"
+    # Dibaca dari agregat yang sudah dihitung, tidak perlu groupby ulang
+    kartu = hitung_kartu(jenis, tahun)
 
     return (
-        f"{total_guru} Guru",
-        f"{rata_rata:.2f}",
-        top_indikator,
-        top_guru,
-        best_improve,
-        bottom_indikator
+        f"{kartu['total_guru']} Guru",
+        f"{kartu['rata_rata']:.2f}",
+        kartu["top_indikator"],
+        kartu["top_guru"],
+        kartu["best_improve"],
+        kartu["bottom_indikator"]
     )
 
+KOLOM_TABEL = ["Nama Guru", "Periode", "Tahun", "Indikator", "Nilai", "Jenis"]
+
+# Operator filter_query DataTable, urutan penting ("ge " harus dicek sebelum "gt " dst.)
+OPERATOR_FILTER = [["ge ", ">="], ["le ", "<="], ["lt ", "<"], ["gt ", ">"],
+                   ["ne ", "!="], ["eq ", "="], ["contains "], ["datestartswith "]]
+
+def split_filter_part(filter_part):
+    for operator_type in OPERATOR_FILTER:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find("{") + 1: name_part.rfind("}")]
+                value_part = value_part.strip()
+                v0 = value_part[0] if value_part else ""
+                if v0 and v0 == value_part[-1] and v0 in ("'", '"', "`"):
+                    value = value_part[1:-1].replace("\\" + v0, v0)
+                else:
+                    try:
+                        value = float(value_part)
+                    except ValueError:
+                        value = value_part
+                return name, operator_type[0].strip(), value
+    return None, None, None
+
+def filter_tabel(df, filter_query):
+    for filter_part in (filter_query or "").split(" && "):
+        kolom, operator, nilai = split_filter_part(filter_part)
+        if kolom not in df.columns:
+            continue
+        if operator == "contains":
+            df = df[df[kolom].astype(str).str.contains(str(nilai), case=False, regex=False)]
+        elif operator == "datestartswith":
+            df = df[df[kolom].astype(str).str.startswith(str(nilai))]
+        elif kolom == "Nilai" and isinstance(nilai, float):
+            nilai_kolom = pd.to_numeric(df[kolom], errors="coerce")
+            df = df[{"ge": nilai_kolom >= nilai, "le": nilai_kolom <= nilai, "lt": nilai_kolom < nilai,
+                     "gt": nilai_kolom > nilai, "ne": nilai_kolom != nilai, "eq": nilai_kolom == nilai}[operator]]
+        elif operator in ("eq", "ne"):
+            cocok = df[kolom].astype(str) == str(nilai)
+            df = df[cocok if operator == "eq" else ~cocok]
+        else:
+            nilai_kolom = df[kolom].astype(str)
+            df = df[{"ge": nilai_kolom >= str(nilai), "le": nilai_kolom <= str(nilai),
+                     "lt": nilai_kolom < str(nilai), "gt": nilai_kolom > str(nilai)}[operator]]
+    return df
+
+@waktu_pandas()
+def query_tabel(jenis, role, username, search_value, filter_query, sort_by):
+    # Ambil baris yang relevan lewat index guru dulu, baru filter & sort di server.
+    # Tahun yang belum siap dilewati dulu, menyusul lewat dataset-status.
+    # Kembalikan (df, {tahun: versi database baris yang diambil}).
+    tahun_siap = [t for t in sorted(dataset_files[jenis]) if get_dataset(jenis, t) is not None]
+    if role == "admin" and search_value:
+        # Nama yang memuat teks cari; kalau tidak ada sama sekali, nama dengan ejaan mirip (salah ketik)
+        nama_hasil_cari = set(cari_guru(search_value, mirip=False)) or set(cari_guru(search_value))
+    frames, versi = [], {}
+    for t in tahun_siap:
+        with baca_dataset(jenis, t):
+            versi[t] = versi_db_lokal.get((jenis, t))
+            if role == "user":
+                frames.append(baris_guru(jenis, t, username_ke_nama(username)))
+            elif search_value:
+                nama_ada = _nama_per_dataset.get((jenis, t), set())
+                nama_cocok = sorted({normalisasi_nama(n) for n in nama_hasil_cari if n in nama_ada})
+                frames.append(baris_banyak_guru(jenis, t, nama_cocok))
+            else:
+                frames.append(datasets[jenis][t])
+    if not frames:
+        return pd.DataFrame(columns=KOLOM_TABEL), versi
+
+    df = pd.concat(seragamkan_kategori(frames), ignore_index=True)
+    if role == "admin" and search_value:
+        # Kelompok nama normalized bisa memuat ejaan lain, saring lagi dengan nama aslinya
+        df = df[df["Nama Guru"].isin(nama_hasil_cari)]
+    df["Jenis"] = pd.Categorical.from_codes([0] * len(df), categories=[jenis])
+
+    df = filter_tabel(df, filter_query)
+    if sort_by:
+        df = df.sort_values(
+            [s["column_id"] for s in sort_by],
+            ascending=[s["direction"] == "asc" for s in sort_by],
+            kind="mergesort",
+            key=kunci_urut
+        )
+    return df, versi
+
+def id_baris(tahun, nama, periode, indikator):
+    return f"{tahun}|{nama}|{periode}|{indikator}"
+
+def parse_id_baris(row_id):
+    tahun, sisa = row_id.split("|", 1)
+    nama, periode, indikator = sisa.rsplit("|", 2)
+    return tahun, (nama, periode, indikator)
+
+def _sama(a, b):
+    return (pd.isna(a) and pd.isna(b)) if (pd.isna(a) or pd.isna(b)) else a == b
+
+@waktu_pandas()
+def kelompokkan_edit(rows, jenis_default):
+    # Bandingkan baris halaman tabel dengan isinya saat dimuat: baris ber-id yang berubah jadi "ubah"
+    # (beserta harapan versi & nilai lamanya), baris tanpa id (hasil Tambah Data) jadi "tambah".
+    # "baris" mencatat indeks baris tabel per kunci (None untuk tambah). Baris yang isinya tidak sah
+    # dilewati dan dikembalikan sebagai {indeks: pesan}
+    perubahan, tidak_sah = {}, {}
+    for i, row in enumerate(rows or []):
+        baru = {
+            "Nama Guru": row.get("Nama Guru"),
+            "Periode": row.get("Periode"),
+            "Indikator": row.get("Indikator"),
+        }
+        if not all(baru.values()):
+            continue
+        baru["Nilai"] = _ke_angka(row.get("Nilai"))
+        jenis = row.get("Jenis") or jenis_default
+        if row.get("id"):
+            tahun, kunci = parse_id_baris(row["id"])
+            if get_dataset(jenis, tahun) is None:
+                continue
+            if "nilai_asal" in row:
+                # Isi saat dimuat, bukan isi server sekarang: nilai yang sementara itu diubah admin lain
+                # tidak boleh tertimpa nilai lama yang masih tampil di browser
+                lama = dict(zip(["Nama Guru", "Periode", "Indikator"], kunci), Nilai=_ke_angka(row["nilai_asal"]))
+            else:
+                with baca_dataset(jenis, tahun):
+                    pos = posisi_baris(jenis, tahun, *kunci)
+                    lama = None if pos is None else datasets[jenis][tahun].loc[pos]
+            if lama is not None:
+                baru = {k: v for k, v in baru.items() if not _sama(lama[k], v)}
+                if not baru:
+                    continue
+            pesan = validasi_baris(jenis, tahun, baru, row.get("Nilai"))
+            if pesan:
+                tidak_sah[i] = pesan
+                continue
+            edit = perubahan.setdefault((jenis, tahun), {"ubah": [], "tambah": [], "harapan": {}, "baris": []})
+            edit["ubah"].append((kunci, baru))
+            edit["baris"].append((i, kunci))
+            if "nilai_asal" in row:
+                edit["harapan"][kunci] = (row.get("versi"), lama["Nilai"])
+        else:
+            tahun = row.get("Tahun")
+            if get_dataset(jenis, tahun) is None:
+                continue
+            pesan = validasi_baris(jenis, tahun, baru, row.get("Nilai"))
+            if pesan:
+                tidak_sah[i] = pesan
+                continue
+            baru["Tahun"] = tahun
+            edit = perubahan.setdefault((jenis, tahun), {"ubah": [], "tambah": [], "harapan": {}, "baris": []})
+            edit["tambah"].append(baru)
+            edit["baris"].append((i, None))
+    return perubahan, tidak_sah
+
 @app.callback(
     Output("editable-table", "data"),
     Output("editable-table", "columns"),
     Output("editable-table", "style_data_conditional"),
+    Output("editable-table", "page_count"),
+    Output("editable-table", "page_current"),
     Input("jenis-dropdown", "value"),
     Input("tahun-radio", "value"),
     Input("session-store", "data"),
-    Input("search-guru", "value")
+    Input("search-guru", "value"),
+    Input("dataset-status", "data"),
+    Input("editable-table", "page_current"),
+    Input("editable-table", "page_size"),
+    Input("editable-table", "sort_by"),
+    Input("editable-table", "filter_query")
 )
-def update_editable_table(jenis, tahun, session_data, search_value):
+def update_editable_table(jenis, tahun, session_data, search_value, dataset_status,
+                          page_current, page_size, sort_by, filter_query):
     if not session_data:
-        return [], [], []
+        return [], [], [], 1, 0
 
     username = session_data.get("username")
     role = session_data.get("role")
 
-    df = pd.concat(datasets[jenis].values(), ignore_index=True)
+    df, versi = query_tabel(jenis, role, username, search_value if role == "admin" else None, filter_query, sort_by)
 
-    for col in ["Jenis", "Tahun"]:
-        if col not in df.columns:
-            df[col] = jenis if col == "Jenis" else tahun
+    # Hanya halaman yang terlihat yang dikirim ke browser
+    page_size = page_size or 10
+    page_count = max(1, -(-len(df) // page_size))
+    page_current = min(page_current or 0, page_count - 1)
+    halaman = df.iloc[page_current * page_size:(page_current + 1) * page_size]
 
-    if role == "user":
-        nama_user = username.replace("@ses.com", "").strip().lower()
-        df["Nama Guru Normalized"] = df["Nama Guru"].astype(str).str.replace(" ", "").str.lower().str.strip()
-        df = df[df["Nama Guru Normalized"] == nama_user]
-
-    if role == "admin" and search_value:
-        df = df[df["Nama Guru"].astype(str).str.lower().str.contains(search_value.strip().lower())]
+    # versi & nilai_asal (tidak tampil sebagai kolom) dikirim balik saat simpan untuk cek bentrok edit
+    rows = halaman[KOLOM_TABEL].to_dict("records")
+    for row in rows:
+        row["id"] = id_baris(row["Tahun"], row["Nama Guru"], row["Periode"], row["Indikator"])
+        row["versi"] = versi.get(row["Tahun"])
+        row["nilai_asal"] = row["Nilai"]
 
+    # Jenis & Tahun menentukan dataset tujuan, jadi tidak bisa diedit langsung di tabel
     columns = [
-        {"name": i, "id": i, "editable": True if role == "admin" else False}
-        for i in df.columns if i != "Nama Guru Normalized"
+        {"name": i, "id": i, "editable": role == "admin" and i not in ("Jenis", "Tahun")}
+        for i in KOLOM_TABEL
     ]
 
     style_conditional = []
@@ -445,31 +2627,68 @@ def update_editable_table(jenis, tahun, session_data, search_value):
             "fontWeight": "bold"
         }]
 
-    return df.to_dict("records"), columns, style_conditional
+    return rows, columns, style_conditional, page_count, page_current
+
+@app.callback(
+    Output('dataset-status', 'data'),
+    Output('dataset-poll', 'disabled'),
+    Output('dataset-poll', 'interval'),
+    Input('dataset-poll', 'n_intervals'),
+    Input('jenis-dropdown', 'value'),
+    Input('tahun-radio', 'value'),
+    State('dataset-status', 'data')
+)
+def update_dataset_status(n_intervals, jenis, tahun, status):
+    # Penanda kesiapan dataset: callback data ikut jalan lagi setiap ada dataset yang selesai dimuat
+    if jenis and tahun:
+        get_dataset(jenis, tahun)  # Mode lazy: mulai muat saat pertama dipilih
+
+    siap = {j: sorted(datasets[j].keys()) for j in dataset_files}
+    # Selama ada yang dimuat dicek tiap detik, sesudahnya cukup mengikuti interval pemantau folder
+    memuat = masih_memuat()
+    interval = 1000 if memuat else int(max(PANTAU_DETIK, 1) * 1000)
+    poll_mati = not memuat and PANTAU_DETIK <= 0
+    if siap == status:
+        return dash.no_update, poll_mati, interval
+    return siap, poll_mati, interval
 
 @app.callback(
+    Output('tahun-per-jenis', 'data'),
+    Input('dataset-poll', 'n_intervals'),
+    State('tahun-per-jenis', 'data'),
+    prevent_initial_call=True
+)
+def update_daftar_tahun(n_intervals, tahun_per_jenis):
+    # Workbook baru dari pemantau folder: perbarui pilihan jenis & tahun tanpa reload halaman
+    daftar = {jenis: sorted(files) for jenis, files in dataset_files.items()}
+    return dash.no_update if daftar == tahun_per_jenis else daftar
+
+app.clientside_callback(
+    """
+    function(sessionData) {
+        if (sessionData && sessionData.logged_in) {
+            return [{display: "none"}, {display: "block"}];
+        }
+        return [{display: "block"}, {display: "none"}];
+    }
+    """,
     Output('login-section', 'style'),
     Output('app-layout', 'style'),
     Input('session-store', 'data')
 )
-def toggle_layout(session_data):
-    if session_data and session_data.get("logged_in"):
-        return {"display": "none"}, {"display": "block"}
-    return {"display": "block"}, {"display": "none"}
 
-@app.callback(
+app.clientside_callback(
+    """
+    function(sessionData) {
+        if (!sessionData) {
+            throw window.dash_clientside.PreventUpdate;
+        }
+        return {display: sessionData.role === "admin" ? "block" : "none"};
+    }
+    """,
     Output("admin-controls", "style"),
     Input("session-store", "data")
 )
-def toggle_admin_controls(session_data):
-    if not session_data:
-        raise dash.exceptions.PreventUpdate
-
-    role = session_data.get("role", "")
-    if role == "admin":
-        return {"display": "block"}
-    else:
-        return {"display": "none"}
 
 
 @app.callback(
@@ -491,28 +2710,36 @@ def login(n_clicks, username, password):
         return {"logged_in": True, "username": username, "role": "admin"}, ""
 
     if username.endswith("@ses.com"):
-        nama_user = username.replace("@ses.com", "").strip().lower()
-
-        # ⬇️ Generate valid usernames saat login (bukan di awal)
-        valid_usernames = get_all_guru_usernames()
+        nama_user = username_ke_nama(username)
 
-        if nama_user in valid_usernames:
+        ada = cek_username(nama_user)
+        if ada:
             return {"logged_in": True, "username": username, "role": "user"}, ""
-        else:
-            return dash.no_update, f"❌ Username '{nama_user}' tidak ditemukan dalam data guru."
+        if ada is None:
+            return dash.no_update, "⏳ Data guru masih dimuat, coba lagi sebentar."
+        # Ejaan sedikit berbeda (salah ketik, gelar): masuk sebagai guru yang paling mirip
+        nama_asli = cari_username_mirip(nama_user)
+        if nama_asli is not None:
+            return {"logged_in": True, "username": f"{normalisasi_nama(nama_asli)}@ses.com", "role": "user"}, ""
+        return dash.no_update, f"❌ Username '{nama_user}' tidak ditemukan dalam data guru."
 
     return dash.no_update, "❌ Format username salah. Gunakan format: namaguru@ses.com"
 
-@app.callback(
+app.clientside_callback(
+    """
+    function(nClicks) {
+        return true;
+    }
+    """,
     Output('session-store', 'clear_data'),
     Input('btn-logout', 'n_clicks'),
     prevent_initial_call=True
 )
-def logout(n_clicks):
-    return True
 
 @app.callback(
     Output("save-status", "children"),
+    Output("editable-table", "data", allow_duplicate=True),
+    Output("data-versi", "data", allow_duplicate=True),
     Input("save-button", "n_clicks"),
     State("editable-table", "data"),
     State("jenis-dropdown", "value"),
@@ -522,23 +2749,138 @@ def logout(n_clicks):
 )
 def save_edited_data(n_clicks, rows, jenis, tahun, session_data):
     if not session_data or session_data.get("role") != "admin":
-        return "❌ Akses ditolak. Hanya admin yang bisa menyimpan."
+        return "❌ Akses ditolak. Hanya admin yang bisa menyimpan.", dash.no_update, dash.no_update
 
     if n_clicks == 0:
         raise dash.exceptions.PreventUpdate
 
-    df_updated = pd.DataFrame(rows)
-    df_updated["Nilai"] = pd.to_numeric(df_updated["Nilai"], errors="coerce")
-    df_updated = df_updated.dropna(subset=["Nama Guru", "Indikator", "Periode"])
+    # Tabel hanya berisi satu halaman: simpan baris yang berubah ke dataset asalnya masing-masing
+    perubahan, tidak_sah = kelompokkan_edit(rows, jenis)
+    tidak_ketemu, konflik = 0, 0
+    patch = dash.Patch()
+    for (jenis_tujuan, tahun_tujuan), edit in perubahan.items():
+        try:
+            hasil = terapkan_perubahan(jenis_tujuan, tahun_tujuan, ubah=edit["ubah"], tambah=edit["tambah"],
+                                       harapan=edit["harapan"])
+        except ValueError as e:
+            return f"❌ Gagal menyimpan {tahun_tujuan}: {e}", patch, _versi_counter
+        tidak_ketemu += hasil["tidak_ketemu"]
+        konflik += len(hasil["konflik"])
+        # Browser cukup menerima id, versi & nilai_asal baru untuk baris yang tersimpan
+        for i, kunci in edit["baris"]:
+            if kunci in hasil["konflik"]:
+                continue
+            row = rows[i]
+            row_id = id_baris(row["Tahun"], row["Nama Guru"], row["Periode"], row["Indikator"])
+            if row.get("id") != row_id:
+                patch[i]["id"] = row_id
+            patch[i]["versi"] = hasil["versi"]
+            patch[i]["nilai_asal"] = _nilai_db(row.get("Nilai"))
+
+    pesan = []
+    if tidak_sah:
+        pesan.append("sebagian baris tidak disimpan (" + "; ".join(f"baris {i + 1}: {p}" for i, p in sorted(tidak_sah.items())) + ")")
+    if konflik:
+        pesan.append(f"{konflik} baris sudah diubah admin lain sejak tabel dimuat dan tidak ditimpa, muat ulang tabel")
+    if tidak_ketemu:
+        pesan.append(f"{tidak_ketemu} baris tidak ditemukan lagi di server, muat ulang tabel")
+    if pesan:
+        pesan = "; ".join(pesan)
+        return f"⚠️ {pesan[0].upper()}{pesan[1:]}.", patch, _versi_counter
+    return "✅ Perubahan berhasil disimpan.", patch, _versi_counter
+
+# Dengan diskcache (ada di requirements.txt) upload dan ekspor laporan jalan sebagai background
+# callback: workbook divalidasi & diimpor (atau laporan dirender) di proses job terpisah, request langsung
+# selesai dan browser menerima progress. Kalau diskcache tidak terpasang keduanya diproses langsung di
+# dalam request.
+try:
+    import diskcache
+    manager_background = DiskcacheManager(diskcache.Cache(os.path.join(CACHE_DIR, "background")))
+except ImportError:
+    manager_background = None
+
+def proses_upload(set_progress, contents, filenames, ganti, session_data):
+    if not session_data or session_data.get("role") != "admin":
+        return "❌ Akses ditolak. Hanya admin yang bisa mengunggah.", dash.no_update
+    if not contents:
+        raise dash.exceptions.PreventUpdate
 
-    datasets[jenis][tahun] = df_updated
+    pesan, hasil = [], []
+    for i, (isi, nama) in enumerate(zip(contents, filenames)):
+        set_progress((str(i), str(len(contents)), f"⏳ Memproses {nama} ({i + 1}/{len(contents)})..."))
+        try:
+            jenis, tahun = impor_workbook_upload(nama, base64.b64decode(isi.split(",", 1)[1]), ganti=bool(ganti))
+        except Exception as e:
+            pesan.append(f"❌ {nama}: {e}")
+            continue
+        hasil.append([jenis, tahun])
+        pesan.append(f"✅ {nama}: {jenis} {tahun} berhasil diimpor")
+    set_progress((str(len(contents)), str(len(contents)), ""))
+    return [html.Div(p) for p in pesan], hasil
+
+_output_upload = [Output("upload-status", "children"), Output("upload-hasil", "data")]
+_input_upload = [Input("upload-data", "contents"), State("upload-data", "filename"),
+                 State("upload-ganti", "value"), State("session-store", "data")]
+if manager_background is not None:
+    app.callback(*_output_upload, *_input_upload, prevent_initial_call=True, background=True, manager=manager_background,
+                 progress=[Output("upload-progress", "value"), Output("upload-progress", "max"),
+                           Output("upload-progress-teks", "children")],
+                 running=[(Output("upload-data", "disabled"), True, False)])(proses_upload)
+else:
+    app.callback(*_output_upload, *_input_upload, prevent_initial_call=True)(
+        lambda *args: proses_upload(lambda progress: None, *args))
+
+def proses_ekspor(set_progress, n_clicks, fmt, jenis, tahun, session_data):
+    if not session_data or session_data.get("role") != "admin":
+        return "❌ Akses ditolak. Hanya admin yang bisa mengekspor.", dash.no_update
+    if not n_clicks:
+        raise dash.exceptions.PreventUpdate
 
-    return "✅ Perubahan berhasil disimpan."
+    try:
+        hasil = ekspor_laporan(jenis, tahun, fmt, progress=lambda i, n: set_progress((str(i), str(n))))
+    except Exception as e:
+        return f"❌ Gagal mengekspor {jenis} {tahun}: {e}", dash.no_update
+    return (f"✅ {hasil['total']} guru ({hasil['dirender']} dirender ulang, {hasil['dari_cache']} dari cache)",
+            dcc.send_bytes(zip_laporan(hasil["folder"]), f"Laporan {jenis} {tahun} {fmt.upper()}.zip"))
+
+_output_ekspor = [Output("ekspor-status", "children"), Output("ekspor-download", "data")]
+_input_ekspor = [Input("ekspor-button", "n_clicks"), State("ekspor-format", "value"), State("jenis-dropdown", "value"),
+                 State("tahun-radio", "value"), State("session-store", "data")]
+if manager_background is not None:
+    app.callback(*_output_ekspor, *_input_ekspor, prevent_initial_call=True, background=True, manager=manager_background,
+                 progress=[Output("ekspor-progress", "value"), Output("ekspor-progress", "max")],
+                 running=[(Output("ekspor-button", "disabled"), True, False)])(proses_ekspor)
+else:
+    app.callback(*_output_ekspor, *_input_ekspor, prevent_initial_call=True)(
+        lambda *args: proses_ekspor(lambda progress: None, *args))
+
+@app.callback(
+    Output("tahun-per-jenis", "data", allow_duplicate=True),
+    Output("data-versi", "data", allow_duplicate=True),
+    Input("upload-hasil", "data"),
+    State("session-store", "data"),
+    prevent_initial_call=True
+)
+def daftarkan_upload(hasil, session_data):
+    # Jalan di proses server setelah job upload selesai: daftarkan tahun baru, muat ulang yang ditimpa
+    if not hasil or not session_data or session_data.get("role") != "admin":
+        raise dash.exceptions.PreventUpdate
+    baru = []
+    for jenis, tahun in hasil:
+        path = path_workbook(jenis, tahun)
+        if path is None or not os.path.exists(path):
+            continue
+        _stat_terlihat[path] = _stat_dipakai[path] = _stat_file(path)  # Sudah diimpor, tidak perlu diberi peringatan
+        if tahun not in dataset_files.get(jenis, {}):
+            baru.append((jenis, tahun, path))
+    daftarkan_dataset_baru(baru)
+    segarkan_dataset(paksa=True)
+    return {jenis: sorted(files) for jenis, files in dataset_files.items()}, _versi_counter
 
 @app.callback(
     Output("editable-table", "data", allow_duplicate=True),
+    Output("save-status", "children", allow_duplicate=True),
     Input("add-row-button", "n_clicks"),
-    State("editable-table", "data"),
     State("input-nama-guru", "value"),
     State("input-indikator", "value"),
     State("input-nilai", "value"),
@@ -548,13 +2890,24 @@ def save_edited_data(n_clicks, rows, jenis, tahun, session_data):
     State("session-store", "data"),  # Tambahkan ini
     prevent_initial_call="initial_duplicate"
 )
-def tambah_data(n_clicks, data, nama_guru, indikator, nilai, periode, jenis, tahun, session_data):
+def tambah_data(n_clicks, nama_guru, indikator, nilai, periode, jenis, tahun, session_data):
     if not session_data or session_data.get("role") != "admin":
         raise dash.exceptions.PreventUpdate
 
     if not all([nama_guru, indikator, nilai, periode, jenis, tahun]):
         raise dash.exceptions.PreventUpdate
 
+    # Validasi di server terhadap dataset tujuan, browser hanya menerima baris barunya
+    nama_guru, indikator = nama_guru.strip(), str(indikator).strip().upper()
+    if get_dataset(jenis, tahun) is None:
+        return dash.no_update, f"❌ Data {jenis} {tahun} belum siap, coba lagi sebentar."
+    pesan = validasi_baris(jenis, tahun, {"Nama Guru": nama_guru, "Periode": periode, "Indikator": indikator,
+                                          "Nilai": _ke_angka(nilai)}, nilai)
+    if pesan is None and posisi_baris(jenis, tahun, nama_guru, periode, indikator) is not None:
+        pesan = "Baris ini sudah ada, ubah nilainya langsung di tabel"
+    if pesan:
+        return dash.no_update, f"❌ {pesan}."
+
     new_row = {
         "Nama Guru": nama_guru,
         "Indikator": indikator,
@@ -564,30 +2917,51 @@ def tambah_data(n_clicks, data, nama_guru, indikator, nilai, periode, jenis, tah
         "Tahun": tahun
     }
 
-    return data + [new_row]
+    patch = dash.Patch()
+    patch.append(new_row)
+    return patch, "➕ Baris ditambahkan, klik Simpan Perubahan untuk menyimpan."
 
 @app.callback(
     Output("editable-table", "data", allow_duplicate=True),
+    Output("editable-table", "selected_rows"),
+    Output("data-versi", "data", allow_duplicate=True),
+    Output("save-status", "children", allow_duplicate=True),
     Input("delete-row-button", "n_clicks"),
-    State("editable-table", "data"),
     State("editable-table", "selected_rows"),
+    State("editable-table", "selected_row_ids"),
     State("jenis-dropdown", "value"),
-    State("tahun-radio", "value"),
     State("session-store", "data"),  # Tambahkan ini
     prevent_initial_call="initial_duplicate"
 )
-def delete_row(n_clicks, data, selected_rows, jenis, tahun, session_data):
+def delete_row(n_clicks, selected_rows, selected_row_ids, jenis, session_data):
     if not session_data or session_data.get("role") != "admin":
         raise dash.exceptions.PreventUpdate
 
-    if n_clicks > 0 and selected_rows:
-        for idx in sorted(selected_rows, reverse=True):
-            data.pop(idx)
-        df_updated = pd.DataFrame(data)
-        datasets[jenis][tahun] = df_updated
-
-    return data
+    if not n_clicks or not selected_rows:
+        raise dash.exceptions.PreventUpdate
 
+    # Hanya id baris terpilih yang dikirim; baris tanpa id belum pernah disimpan, cukup dibuang dari tabel
+    hapus = {}
+    for row_id in selected_row_ids or []:
+        if not row_id:
+            continue
+        tahun_row, kunci = parse_id_baris(row_id)
+        hapus.setdefault(tahun_row, []).append(kunci)
+    tidak_ketemu = 0
+    for tahun_row, kunci_list in hapus.items():
+        if get_dataset(jenis, tahun_row) is None:
+            return dash.no_update, dash.no_update, dash.no_update, f"❌ Data {jenis} {tahun_row} belum siap."
+        try:
+            tidak_ketemu += terapkan_perubahan(jenis, tahun_row, hapus=kunci_list)["tidak_ketemu"]
+        except ValueError as e:
+            return dash.no_update, dash.no_update, _versi_counter, f"❌ Gagal menghapus: {e}"
+
+    patch = dash.Patch()
+    for idx in sorted(selected_rows, reverse=True):
+        del patch[idx]
+    if tidak_ketemu:
+        return patch, [], _versi_counter, f"⚠️ {tidak_ketemu} baris sudah tidak ada di server."
+    return patch, [], _versi_counter, "🗑️ Baris dihapus."
 
 
 if __name__ == '__main__':
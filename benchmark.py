@@ -0,0 +1,203 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Benchmark load_and_process dan callback utama dengan workbook buatan.
+#   python benchmark.py --guru 50 1000 10000 --tahun 3 20
+# Tiap ukuran jalan di proses terpisah (state modul app bersifat global), hasilnya ditambahkan
+# ke benchmark_hasil.jsonl supaya bisa dibandingkan antar versi kode.
+
+FOLDER = os.path.dirname(os.path.abspath(__file__))
+JENIS_RPP = "Penilaian Rencana Pelaksanaan Pembelajaran"
+JENIS_PELAKSANAAN = "Penilaian Pelaksanaan Pembelajaran"
+INDIKATOR = {JENIS_RPP: list("ABCDEFG"), JENIS_PELAKSANAAN: list("ABCDEFGHIJK")}
+GELAR = ["S.Pd", "S.Si", "S.S", "S.E", "S.Kom", "M.Pd", "S.Pd, M.Pd"]
+
+def nama_guru(i):
+    return f"Guru Sintetis {i:05d}"
+
+def daftar_tahun(n_tahun, mulai=2000):
+    return [f"{mulai + i}-{mulai + i + 1}" for i in range(n_tahun)]
+
+def buat_workbook(filepath, jenis, n_guru, seed):
+    # Tata letak sama dengan workbook asli: judul di baris 1-2, kode indikator di baris 3 dan
+    # diulang untuk periode ke-2 (jadi pandas memberi akhiran .1), lalu Jumlah/Total/Ban per periode
+    from openpyxl import Workbook
+
+    rng = random.Random(seed)
+    indikator = INDIKATOR[jenis]
+    lebar = len(indikator) + 3
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+    ws.append(["No. ", "Nama Guru ", jenis])
+    ws.append([None, None, "Observasi  1st Periode"] + [None] * (lebar - 1) + ["Observasi  2nd Periode"])
+    ws.append([None, None] + (indikator + ["Jumlah ", "Total ", "Ban"]) * 2)
+    for i in range(n_guru):
+        baris = [i + 1, f"{nama_guru(i)}, {rng.choice(GELAR)}"]
+        for _ in range(2):
+            if rng.random() < 0.05:
+                nilai = [None] * len(indikator)  # guru yang belum diobservasi di periode ini
+            else:
+                nilai = [rng.choice([rng.randint(4, 28), rng.randint(8, 56) / 2]) for _ in indikator]
+            jumlah = sum(n or 0 for n in nilai)
+            baris += nilai + [jumlah, round(jumlah / 36, 2), "Baik"]
+        ws.append(baris)
+    wb.save(filepath)
+
+def folder_data(n_guru, n_tahun):
+    return os.path.join(FOLDER, ".cache", "benchmark", f"{n_guru}x{n_tahun}")
+
+def siapkan_data(n_guru, n_tahun, folder=None):
+    # Workbook dibuat sekali per ukuran lalu dipakai ulang (isinya deterministik)
+    folder = folder or folder_data(n_guru, n_tahun)
+    os.makedirs(folder, exist_ok=True)
+    files = {}
+    for j, jenis in enumerate(INDIKATOR):
+        files[jenis] = {}
+        for t, tahun in enumerate(daftar_tahun(n_tahun)):
+            path = os.path.join(folder, f"{jenis} {tahun}.xlsx")
+            if not os.path.exists(path):
+                buat_workbook(path, jenis, n_guru, seed=j * 10000 + t)
+            files[jenis][tahun] = path
+    return files
+
+def ukur(fungsi, ulang, sebelum=None):
+    # Kembalikan statistik waktu dalam milidetik; sebelum() dipanggil di luar pengukuran
+    waktu = []
+    for _ in range(ulang):
+        if sebelum:
+            sebelum()
+        mulai = time.perf_counter()
+        fungsi()
+        waktu.append((time.perf_counter() - mulai) * 1000)
+    return {"median_ms": round(statistics.median(waktu), 3), "min_ms": round(min(waktu), 3),
+            "max_ms": round(max(waktu), 3), "n": ulang}
+
+def jalankan_skenario(n_guru, n_tahun, ulang):
+    files = siapkan_data(n_guru, n_tahun)
+    kerja = tempfile.mkdtemp(prefix="supervisi-bench-")
+    # Harus di-set sebelum app diimport: database & cache terpisah, workbook sintetis sebagai
+    # folder data, tanpa autoload dan tanpa pemantau folder
+    os.environ["SUPERVISI_DB"] = os.path.join(kerja, "bench.db")
+    os.environ["SUPERVISI_CACHE_DIR"] = os.path.join(kerja, "cache")
+    os.environ["SUPERVISI_DATA_DIR"] = folder_data(n_guru, n_tahun)
+    os.environ["SUPERVISI_LAZY"] = "1"
+    os.environ["SUPERVISI_PANTAU_DETIK"] = "0"
+    sys.path.insert(0, FOLDER)
+    import app
+    jenis = JENIS_PELAKSANAAN
+    tahun = daftar_tahun(n_tahun)[-1]
+    admin = {"logged_in": True, "username": "admin@ses.com", "role": "admin"}
+    username = app.hapus_gelar(nama_guru(n_guru // 2)) + "@ses.com"
+    user = {"logged_in": True, "username": username, "role": "user"}
+    guru = nama_guru(n_guru // 2)
+    hasil = {}
+
+    hasil["load_and_process"] = ukur(lambda: app.load_and_process(files[jenis][tahun], tahun, jenis), ulang)
+    hasil["muat_semua_dataset"] = ukur(app._tunggu_semua_dataset, 1)
+    hasil["login_admin"] = ukur(lambda: app.login(1, "admin@ses.com", "testing123"), ulang)
+    hasil["login_guru"] = ukur(lambda: app.login(1, username, "testing123"), ulang)
+    hasil["update_cards"] = ukur(lambda: app.update_cards(jenis, tahun, None), ulang,
+                                 sebelum=app._kartu_cache.clear)
+    hasil["update_cards_cache"] = ukur(lambda: app.update_cards(jenis, tahun, None), ulang)
+    hasil["update_guru_dropdown_admin"] = ukur(lambda: app.update_guru_dropdown(jenis, tahun, admin, None), ulang)
+    hasil["update_guru_dropdown_guru"] = ukur(lambda: app.update_guru_dropdown(jenis, tahun, user, None), ulang)
+    hasil["update_editable_table_admin"] = ukur(
+        lambda: app.update_editable_table(jenis, tahun, admin, None, None, 0, 10, [], ""), ulang)
+    hasil["update_editable_table_admin_cari_urut"] = ukur(
+        lambda: app.update_editable_table(jenis, tahun, admin, "sintetis 00", None, 3, 10,
+                                          [{"column_id": "Nilai", "direction": "desc"}], "{Indikator} eq 'B'"), ulang)
+    hasil["update_editable_table_guru"] = ukur(
+        lambda: app.update_editable_table(jenis, tahun, user, None, None, 0, 10, [], ""), ulang)
+    hasil["update_chart_from_table"] = ukur(
+        lambda: app.update_chart_from_table(jenis, tahun, guru, admin, None, None), ulang,
+        sebelum=lambda: app.hapus_cache_grafik(jenis, tahun))
+    hasil["update_chart_from_table_cache"] = ukur(
+        lambda: app.update_chart_from_table(jenis, tahun, guru, admin, None, None), ulang)
+
+    df = app.get_dataset(jenis, tahun)
+    kunci = (df.at[0, "Nama Guru"], df.at[0, "Periode"], df.at[0, "Indikator"])
+    nilai = iter(range(10 ** 6))
+    hasil["terapkan_perubahan"] = ukur(
+        lambda: app.terapkan_perubahan(jenis, tahun, ubah=[(kunci, {"Nilai": float(next(nilai) % 28)})]), ulang)
+    hasil["_memori_bytes"] = sum(app.pemakaian_memori().values())
+    return hasil
+
+def versi_kode():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=FOLDER,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "tanpa-git"
+
+def baca_hasil(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(baris) for baris in f if baris.strip()]
+
+def cetak(catatan, sebelumnya):
+    print(f"\n== {catatan['n_guru']} guru x {catatan['n_tahun']} tahun ({catatan['versi']}) ==")
+    if sebelumnya:
+        print(f"   dibandingkan dengan {sebelumnya['versi']} ({sebelumnya['waktu']})")
+    for nama, h in catatan["hasil"].items():
+        if nama.startswith("_"):
+            continue
+        teks = f"{nama:42s} {h['median_ms']:10.3f} ms (min {h['min_ms']:.3f})"
+        lama = (sebelumnya or {}).get("hasil", {}).get(nama)
+        if lama and lama["median_ms"]:
+            rasio = h["median_ms"] / lama["median_ms"]
+            teks += f"  x{rasio:.2f}" + ("  <-- lebih lambat" if rasio > 1.2 else "")
+        print(teks)
+    print(f"{'memori dataset':42s} {catatan['hasil']['_memori_bytes'] / 1024:10.0f} KB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dashboard supervisi dengan data sintetis")
+    parser.add_argument("--guru", type=int, nargs="+", default=[50, 1000], help="jumlah guru per workbook")
+    parser.add_argument("--tahun", type=int, nargs="+", default=[3], help="jumlah tahun ajaran per jenis")
+    parser.add_argument("--ulang", type=int, default=5, help="pengulangan per pengukuran")
+    parser.add_argument("--hasil", default=os.path.join(FOLDER, "benchmark_hasil.jsonl"))
+    parser.add_argument("--skenario", nargs=2, type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.skenario:
+        # Mode anak: satu ukuran, hasil dikirim lewat stdout baris terakhir
+        print(json.dumps(jalankan_skenario(*args.skenario, args.ulang)))
+        return
+
+    versi = versi_kode()
+    riwayat = baca_hasil(args.hasil)
+    for n_tahun in args.tahun:
+        for n_guru in args.guru:
+            proses = subprocess.run([sys.executable, os.path.abspath(__file__), "--skenario", str(n_guru),
+                                     str(n_tahun), "--ulang", str(args.ulang)], capture_output=True, text=True)
+            if proses.returncode != 0:
+                print(f"Gagal untuk {n_guru} guru x {n_tahun} tahun:\n{proses.stderr}")
+                continue
+            catatan = {
+                "waktu": datetime.now().isoformat(timespec="seconds"),
+                "versi": versi,
+                "python": platform.python_version(),
+                "n_guru": n_guru,
+                "n_tahun": n_tahun,
+                "ulang": args.ulang,
+                "hasil": json.loads(proses.stdout.strip().splitlines()[-1]),
+            }
+            # Pembanding: hasil terakhir untuk ukuran yang sama dari versi kode lain
+            sebelumnya = next((c for c in reversed(riwayat) if c["n_guru"] == n_guru and c["n_tahun"] == n_tahun
+                               and c["versi"] != versi), None)
+            cetak(catatan, sebelumnya)
+            with open(args.hasil, "a", encoding="utf-8") as f:
+                f.write(json.dumps(catatan) + "\n")
+            riwayat.append(catatan)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import argparse
+import os
+import sys
+import time
+
+# Ekspor laporan grafik & ringkasan semua guru ke file statis tanpa membuka dashboard.
+#   python ekspor.py
+#   python ekspor.py --jenis "Penilaian Pelaksanaan Pembelajaran" --tahun 2023-2024 --format png --keluaran laporan
+# Hasil: <keluaran>/<format>/<jenis>/<tahun>/index.html plus satu file per guru. File guru dicatat
+# bersama hash datanya, jadi menjalankan ulang hanya merender guru yang barisnya berubah.
+
+FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+def main():
+    parser = argparse.ArgumentParser(description="Ekspor laporan per guru (HTML/PNG) dari data supervisi")
+    parser.add_argument("--jenis", nargs="+", help="jenis penilaian (default: semua)")
+    parser.add_argument("--tahun", nargs="+", help="tahun ajaran, misal 2023-2024 (default: semua)")
+    parser.add_argument("--format", choices=["html", "png"], default="html")
+    parser.add_argument("--keluaran", help="folder tujuan (default: .cache/ekspor atau SUPERVISI_EKSPOR_DIR)")
+    parser.add_argument("--worker", type=int, help="jumlah proses render (default: sama dengan SUPERVISI_WORKER_MUAT)")
+    args = parser.parse_args()
+
+    # Harus di-set sebelum app diimport: hanya dataset yang diekspor yang dimuat, tanpa pemantau folder
+    os.environ.setdefault("SUPERVISI_LAZY", "1")
+    os.environ.setdefault("SUPERVISI_PANTAU_DETIK", "0")
+    sys.path.insert(0, FOLDER)
+    import app
+
+    gagal = False
+    for jenis in args.jenis or sorted(app.dataset_files):
+        if jenis not in app.dataset_files:
+            print(f"❌ Jenis tidak ditemukan di folder data: {jenis}")
+            gagal = True
+            continue
+        for tahun in args.tahun or sorted(app.dataset_files[jenis]):
+            if tahun not in app.dataset_files[jenis]:
+                print(f"⚠️ {jenis} {tahun}: tidak ada workbook, dilewati")
+                continue
+            mulai = time.perf_counter()
+            try:
+                hasil = app.ekspor_laporan(jenis, tahun, args.format, dasar=args.keluaran, max_worker=args.worker,
+                                           progress=lambda i, n: print(f"   {i}/{n} guru", end="\r"))
+            except Exception as e:
+                print(f"\r❌ {jenis} {tahun}: {e}")
+                gagal = True
+                continue
+            print(f"\r✅ {jenis} {tahun}: {hasil['total']} guru, {hasil['dirender']} dirender, "
+                  f"{hasil['dari_cache']} dari cache ({time.perf_counter() - mulai:.1f} s) -> {hasil['folder']}")
+    sys.exit(1 if gagal else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+import argparse
+import gzip
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import re
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from urllib.parse import quote
+
+import benchmark
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Load test: jalankan app di proses terpisah lalu simulasikan banyak sesi guru & admin sekaligus, masing-
+# masing menjalani rantai callback asli lewat POST /_dash-update-component seperti browser:
+#   login -> update_tahun_dropdown -> update_guru_dropdown -> update_editable_table
+#         -> update_chart_from_table -> save_edited_data (admin)
+#   python loadtest.py --sesi 50 --admin 5 --putaran 3 --guru 1000
+#   python loadtest.py --worker 4 --threads 8      (lewat gunicorn, kalau terpasang)
+# Dilaporkan throughput, latensi p50/p95/p99 per callback dan RSS puncak server (beserta proses
+# anaknya). Hasil ditambahkan ke loadtest_hasil.jsonl dan dibandingkan dengan versi kode sebelumnya.
+
+FOLDER = os.path.dirname(os.path.abspath(__file__))
+PASSWORD = "testing123"
+# Server mewarisi environment ini dan /api/ wajib memakai token yang sama. Daftar guru hanya dibuka
+# dengan token, jadi kalau SUPERVISI_API_TOKEN tidak di-set dibuatkan token acak untuk server load test
+API_TOKEN = os.environ.get("SUPERVISI_API_TOKEN") or secrets.token_urlsafe(16)
+
+# Callback dikenali dari /_dash-dependencies lewat output atau input pemicunya.
+# update_tahun_dropdown jalan di browser (clientside), jadi ditiru di sini tanpa request.
+LANGKAH = {
+    "login": lambda dep: "btn-login.n_clicks" in _input_dep(dep),
+    "update_guru_dropdown": lambda dep: "guru-dropdown.options" in dep["output"],
+    "update_editable_table": lambda dep: "editable-table.columns" in dep["output"],
+    "update_chart_from_table": lambda dep: "bar-chart.figure" in dep["output"],
+    "save_edited_data": lambda dep: "save-button.n_clicks" in _input_dep(dep),
+}
+
+def _input_dep(dep):
+    return {f"{i['id']}.{i['property']}" for i in dep["inputs"]}
+
+def _id_prop(teks):
+    id_, prop = teks.rsplit(".", 1)
+    return {"id": id_, "property": prop}
+
+def _uraikan_output(output):
+    # Output ganda ditulis "..a.prop...b.prop.." (prop bisa berakhiran @hash untuk allow_duplicate)
+    if output.startswith(".."):
+        return [_id_prop(o) for o in output[2:-2].split("...")]
+    return _id_prop(output)
+
+def port_bebas():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def rss_pohon(pid):
+    # RSS server beserta anak-anaknya (worker gunicorn, pool pemuat dataset) dalam byte; None kalau tidak bisa dibaca
+    if psutil is not None:
+        try:
+            induk = psutil.Process(pid)
+            total = induk.memory_info().rss
+            for anak in induk.children(recursive=True):
+                try:
+                    total += anak.memory_info().rss
+                except psutil.Error:
+                    pass
+            return total
+        except psutil.Error:
+            return None
+    # Tanpa psutil: /proc (Linux)
+    total, antre = 0, [pid]
+    while antre:
+        p = antre.pop()
+        try:
+            with open(f"/proc/{p}/status") as f:
+                total += next(int(b.split()[1]) * 1024 for b in f if b.startswith("VmRSS:"))
+            for tid in os.listdir(f"/proc/{p}/task"):
+                with open(f"/proc/{p}/task/{tid}/children") as f:
+                    antre += [int(c) for c in f.read().split()]
+        except (OSError, StopIteration):
+            if p == pid:
+                return None
+    return total
+
+class Klien:
+    # Satu koneksi keep-alive per sesi, disambung ulang kalau server menutupnya
+    def __init__(self, port):
+        self.port = port
+        self.conn = None
+
+    def kirim(self, metode, path, body=None):
+        for coba in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=120)
+            try:
+                headers = {"Content-Type": "application/json", "Accept-Encoding": "gzip"} if body is not None else {}
+                if path.startswith("/api/"):
+                    headers["Authorization"] = f"Bearer {API_TOKEN}"
+                self.conn.request(metode, path, body=None if body is None else json.dumps(body), headers=headers)
+                response = self.conn.getresponse()
+                isi = response.read()
+                if response.getheader("Content-Encoding") == "gzip":
+                    isi = gzip.decompress(isi)
+                return response.status, isi
+            except (http.client.HTTPException, ConnectionError):
+                self.conn.close()
+                self.conn = None
+                if coba:
+                    raise
+
+def kumpulkan_props(node, state):
+    # Nilai awal semua prop komponen ber-id dari /_dash-layout, seperti state awal di browser
+    if isinstance(node, list):
+        for n in node:
+            kumpulkan_props(n, state)
+    elif isinstance(node, dict):
+        props = node.get("props")
+        if isinstance(props, dict):
+            if isinstance(props.get("id"), str):
+                for prop, nilai in props.items():
+                    if prop not in ("id", "children"):
+                        state[f"{props['id']}.{prop}"] = nilai
+            kumpulkan_props(props.get("children"), state)
+
+class Sesi:
+    def __init__(self, port, deps, layout_state, username, catat):
+        self.klien = Klien(port)
+        self.deps = deps
+        self.state = dict(layout_state)
+        self.username = username
+        self.catat = catat
+
+    def panggil(self, langkah, pemicu):
+        dep = self.deps[langkah]
+        body = {
+            "output": dep["output"],
+            "outputs": _uraikan_output(dep["output"]),
+            "inputs": [{"id": i["id"], "property": i["property"], "value": self.state.get(f"{i['id']}.{i['property']}")}
+                       for i in dep["inputs"]],
+            "state": [{"id": s["id"], "property": s["property"], "value": self.state.get(f"{s['id']}.{s['property']}")}
+                      for s in dep["state"]],
+            "changedPropIds": [pemicu],
+        }
+        mulai = time.perf_counter()
+        try:
+            status, isi = self.klien.kirim("POST", "/_dash-update-component", body)
+        except Exception:
+            self.catat(langkah, (time.perf_counter() - mulai) * 1000, False)
+            return False
+        self.catat(langkah, (time.perf_counter() - mulai) * 1000, status in (200, 204))
+        if status != 200:
+            return status == 204  # 204 = PreventUpdate
+        for id_, props in json.loads(isi).get("response", {}).items():
+            for prop, nilai in props.items():
+                # Patch (update sebagian) tidak diterapkan; tabel diambil ulang di putaran berikutnya
+                if not (isinstance(nilai, dict) and "__dash_patch_update" in nilai):
+                    self.state[f"{id_}.{prop}"] = nilai
+        return True
+
+    def jalankan(self, admin):
+        self.state["input-username.value"] = self.username
+        self.state["input-password.value"] = PASSWORD
+        self.state["btn-login.n_clicks"] = self.state.get("btn-login.n_clicks", 0) + 1
+        if not self.panggil("login", "btn-login.n_clicks") or not self.state.get("session-store.data"):
+            return
+        # update_tahun_dropdown (clientside): opsi tahun dari store, pilih tahun pertama
+        jenis = self.state.get("jenis-dropdown.value")
+        tahun_list = (self.state.get("tahun-per-jenis.data") or {}).get(jenis) or []
+        self.state["tahun-radio.options"] = [{"label": t, "value": t} for t in tahun_list]
+        self.state["tahun-radio.value"] = tahun_list[0] if tahun_list else None
+        self.panggil("update_guru_dropdown", "tahun-radio.value")
+        if admin:
+            opsi = self.state.get("guru-dropdown.options") or []
+            self.state["guru-dropdown.value"] = random.choice(opsi)["value"] if opsi else None
+        self.panggil("update_editable_table", "tahun-radio.value")
+        self.panggil("update_chart_from_table", "guru-dropdown.value" if admin else "tahun-radio.value")
+        if admin:
+            rows = self.state.get("editable-table.data") or []
+            if rows:
+                row = random.choice(rows)
+                row["Nilai"] = float(random.randint(4, 28))
+                self.state["save-button.n_clicks"] = self.state.get("save-button.n_clicks", 0) + 1
+                self.panggil("save_edited_data", "save-button.n_clicks")
+
+def persentil(data, p):
+    urut = sorted(data)
+    return urut[min(len(urut) - 1, max(0, math.ceil(p / 100 * len(urut)) - 1))]
+
+def mulai_server(args, port, kerja):
+    env = dict(os.environ)
+    # Database, cache & data terpisah supaya edit dari load test tidak menyentuh data asli
+    env["SUPERVISI_DB"] = os.path.join(kerja, "loadtest.db")
+    env["SUPERVISI_CACHE_DIR"] = os.path.join(kerja, "cache")
+    env["SUPERVISI_DATA_DIR"] = args.data or benchmark.folder_data(args.guru, args.tahun)
+    env["SUPERVISI_PANTAU_DETIK"] = "0"
+    env["SUPERVISI_LAZY"] = "0"
+    env["SUPERVISI_API_TOKEN"] = API_TOKEN
+    if args.worker:
+        perintah = [sys.executable, "-m", "gunicorn", "-w", str(args.worker), "--threads", str(args.threads),
+                    "-b", f"127.0.0.1:{port}", "app:server"]
+    else:
+        perintah = [sys.executable, "-c",
+                    f"import app; app.app.run(host='127.0.0.1', port={port}, threaded=True, debug=False)"]
+    log = open(os.path.join(kerja, "server.log"), "w")
+    return subprocess.Popen(perintah, cwd=FOLDER, env=env, stdout=log, stderr=subprocess.STDOUT), log
+
+def tunggu_siap(proses, port, batas_detik=600):
+    # Siap kalau semua dataset sudah dimuat; dengan beberapa worker gunicorn harus terlihat beberapa kali berturut-turut
+    klien, berturut = Klien(port), 0
+    akhir = time.time() + batas_detik
+    while time.time() < akhir:
+        if proses.poll() is not None:
+            raise RuntimeError("Server berhenti sebelum siap, lihat server.log")
+        try:
+            status, isi = klien.kirim("GET", "/api/dataset")
+            if status == 401:
+                raise RuntimeError("API menolak token; set SUPERVISI_API_TOKEN yang sama dengan server")
+            if status == 200 and all(d["siap"] for d in json.loads(isi)["dataset"]):
+                berturut += 1
+                if berturut >= 5:
+                    return
+            else:
+                berturut = 0
+        except (OSError, http.client.HTTPException):
+            klien.conn = None
+        time.sleep(0.2)
+    raise RuntimeError("Server tidak siap dalam batas waktu")
+
+def jalankan(args):
+    if not args.data:
+        benchmark.siapkan_data(args.guru, args.tahun)
+    kerja = tempfile.mkdtemp(prefix="supervisi-loadtest-")
+    port = args.port or port_bebas()
+    proses, log = mulai_server(args, port, kerja)
+    try:
+        mulai = time.perf_counter()
+        tunggu_siap(proses, port)
+        waktu_siap = time.perf_counter() - mulai
+        klien = Klien(port)
+        deps = json.loads(klien.kirim("GET", "/_dash-dependencies")[1])
+        deps = {nama: next(d for d in deps if not d.get("clientside_function") and cocok(d))
+                for nama, cocok in LANGKAH.items()}
+        layout_state = {}
+        kumpulkan_props(json.loads(klien.kirim("GET", "/_dash-layout")[1]), layout_state)
+
+        # Guru yang login diambil dari tahun pertama jenis default, sama dengan yang dibuka dashboard
+        jenis = layout_state.get("jenis-dropdown.value")
+        tahun = (layout_state.get("tahun-per-jenis.data") or {}).get(jenis, [None])[0]
+        daftar_guru = json.loads(klien.kirim("GET", f"/api/{quote(jenis)}/{tahun}/guru")[1])["guru"]
+        usernames = [re.sub(r"\s", "", g["nama"]).lower() + "@ses.com" for g in daftar_guru]
+
+        hasil, lock = {nama: {"ms": [], "gagal": 0} for nama in LANGKAH}, threading.Lock()
+
+        def catat(langkah, ms, ok):
+            with lock:
+                hasil[langkah]["ms"].append(ms)
+                hasil[langkah]["gagal"] += not ok
+
+        rss = {"awal": rss_pohon(proses.pid), "puncak": 0}
+        selesai = threading.Event()
+
+        def pantau_rss():
+            while not selesai.is_set():
+                n = rss_pohon(proses.pid)
+                if n:
+                    rss["puncak"] = max(rss["puncak"], n)
+                time.sleep(0.1)
+
+        # Semua sesi mulai bersamaan, seperti satu ruang guru login di waktu yang sama
+        mulai_bareng = threading.Barrier(args.sesi)
+
+        def sesi(i):
+            admin = i < args.admin
+            s = Sesi(port, deps, layout_state, "admin@ses.com" if admin else usernames[i % len(usernames)], catat)
+            mulai_bareng.wait()
+            for _ in range(args.putaran):
+                s.jalankan(admin)
+
+        pemantau = threading.Thread(target=pantau_rss, daemon=True)
+        pemantau.start()
+        threads = [threading.Thread(target=sesi, args=(i,)) for i in range(args.sesi)]
+        mulai = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        durasi = time.perf_counter() - mulai
+        selesai.set()
+        pemantau.join()
+    finally:
+        proses.terminate()
+        try:
+            proses.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proses.kill()
+        log.close()
+
+    total = sum(len(h["ms"]) for h in hasil.values())
+    return {
+        "waktu_siap_s": round(waktu_siap, 2),
+        "durasi_s": round(durasi, 3),
+        "request": total,
+        "throughput_rps": round(total / durasi, 1) if durasi else 0,
+        "rss_awal_mb": rss["awal"] and round(rss["awal"] / 2 ** 20, 1),
+        "rss_puncak_mb": rss["puncak"] and round(rss["puncak"] / 2 ** 20, 1),
+        "callback": {nama: {"n": len(h["ms"]), "gagal": h["gagal"],
+                            **({f"p{p}_ms": round(persentil(h["ms"], p), 2) for p in (50, 95, 99)} if h["ms"] else {})}
+                     for nama, h in hasil.items()},
+    }
+
+def cetak(catatan, sebelumnya):
+    h = catatan["hasil"]
+    print(f"\n== {catatan['sesi']} sesi ({catatan['admin']} admin) x {catatan['putaran']} putaran, "
+          f"{catatan['n_guru']} guru x {catatan['n_tahun']} tahun, {catatan['server']} ({catatan['versi']}) ==")
+    if sebelumnya:
+        print(f"   dibandingkan dengan {sebelumnya['versi']} ({sebelumnya['waktu']})")
+    print(f"{'callback':26s} {'n':>6s} {'gagal':>6s} {'p50 ms':>10s} {'p95 ms':>10s} {'p99 ms':>10s}")
+    for nama, c in h["callback"].items():
+        if not c["n"]:
+            continue
+        teks = f"{nama:26s} {c['n']:6d} {c['gagal']:6d} {c['p50_ms']:10.2f} {c['p95_ms']:10.2f} {c['p99_ms']:10.2f}"
+        lama = (sebelumnya or {}).get("hasil", {}).get("callback", {}).get(nama, {})
+        if lama.get("p95_ms"):
+            rasio = c["p95_ms"] / lama["p95_ms"]
+            teks += f"  p95 x{rasio:.2f}" + ("  <-- lebih lambat" if rasio > 1.2 else "")
+        print(teks)
+    teks = f"throughput {h['throughput_rps']} request/s ({h['request']} request dalam {h['durasi_s']} s)"
+    if sebelumnya and sebelumnya["hasil"]["throughput_rps"]:
+        teks += f"  x{h['throughput_rps'] / sebelumnya['hasil']['throughput_rps']:.2f}"
+    print(teks)
+    print(f"RSS server: {h['rss_awal_mb']} MB setelah siap, puncak {h['rss_puncak_mb']} MB; "
+          f"siap dalam {h['waktu_siap_s']} s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test dashboard supervisi dengan banyak sesi bersamaan")
+    parser.add_argument("--sesi", type=int, default=20, help="jumlah sesi bersamaan")
+    parser.add_argument("--admin", type=int, default=2, help="berapa dari sesi itu yang admin (ikut menyimpan edit)")
+    parser.add_argument("--putaran", type=int, default=3, help="berapa kali tiap sesi menjalani rantai callback")
+    parser.add_argument("--guru", type=int, default=200, help="jumlah guru per workbook sintetis")
+    parser.add_argument("--tahun", type=int, default=3, help="jumlah tahun ajaran sintetis per jenis")
+    parser.add_argument("--data", help="folder workbook asli sebagai ganti data sintetis (databasenya tetap sementara)")
+    parser.add_argument("--worker", type=int, default=0, help="jumlah worker gunicorn; 0 = server Flask berthread")
+    parser.add_argument("--threads", type=int, default=8, help="thread per worker gunicorn")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--hasil", default=os.path.join(FOLDER, "loadtest_hasil.jsonl"))
+    args = parser.parse_args()
+    args.admin = min(args.admin, args.sesi)
+
+    catatan = {
+        "waktu": datetime.now().isoformat(timespec="seconds"),
+        "versi": benchmark.versi_kode(),
+        "python": platform.python_version(),
+        "sesi": args.sesi,
+        "admin": args.admin,
+        "putaran": args.putaran,
+        "n_guru": args.guru if not args.data else None,
+        "n_tahun": args.tahun if not args.data else None,
+        "data": args.data,
+        "server": f"gunicorn {args.worker}x{args.threads}" if args.worker else "flask threaded",
+        "hasil": jalankan(args),
+    }
+    kunci = ("sesi", "admin", "putaran", "n_guru", "n_tahun", "data", "server")
+    sebelumnya = next((c for c in reversed(benchmark.baca_hasil(args.hasil))
+                       if all(c.get(k) == catatan[k] for k in kunci) and c["versi"] != catatan["versi"]), None)
+    cetak(catatan, sebelumnya)
+    with open(args.hasil, "a", encoding="utf-8") as f:
+        f.write(json.dumps(catatan) + "\n")
+
+if __name__ == "__main__":
+    main()
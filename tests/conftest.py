@@ -0,0 +1,48 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Tes memakai workbook sintetis dari benchmark.py dan database sementara, jadi data asli di folder
+# repo tidak tersentuh. Variabel lingkungan harus di-set sebelum app diimport.
+FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, FOLDER)
+
+import benchmark
+
+N_GURU = 40
+N_TAHUN = 2
+KERJA = tempfile.mkdtemp(prefix="supervisi-test-")
+os.environ["SUPERVISI_DB"] = os.path.join(KERJA, "tes.db")
+os.environ["SUPERVISI_CACHE_DIR"] = os.path.join(KERJA, "cache")
+os.environ["SUPERVISI_DATA_DIR"] = os.path.join(KERJA, "data")
+os.environ["SUPERVISI_LAZY"] = "1"
+os.environ["SUPERVISI_PANTAU_DETIK"] = "0"
+os.environ["SUPERVISI_WORKER_MUAT"] = "1"
+os.environ.pop("SUPERVISI_API_TOKEN", None)
+benchmark.siapkan_data(N_GURU, N_TAHUN, folder=os.environ["SUPERVISI_DATA_DIR"])
+
+JENIS = benchmark.JENIS_PELAKSANAAN
+TAHUN = benchmark.daftar_tahun(N_TAHUN)[-1]
+ADMIN = {"logged_in": True, "username": "admin@ses.com", "role": "admin"}
+
+@pytest.fixture(scope="session")
+def app():
+    import app as modul
+    modul._tunggu_semua_dataset()
+    return modul
+
+def kunci_baris(df, pos):
+    return tuple(df.loc[pos, ["Nama Guru", "Periode", "Indikator"]])
+
+def cek_agregat(agg, df, app):
+    # Agregat yang diperbarui inkremental harus sama dengan hitung ulang penuh dari frame
+    penuh = app.bangun_agregat(df)
+    assert agg.keys() == penuh.keys()
+    assert agg["baris_guru"] == penuh["baris_guru"]
+    assert agg["total"] == pytest.approx(penuh["total"])
+    for bagian in ("indikator", "guru", "guru_periode", "periode"):
+        assert agg[bagian].keys() == penuh[bagian].keys(), bagian
+        for k, v in penuh[bagian].items():
+            assert agg[bagian][k] == pytest.approx(v), (bagian, k)
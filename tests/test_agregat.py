@@ -0,0 +1,38 @@
+import random
+
+import numpy as np
+
+import benchmark
+from conftest import N_TAHUN, cek_agregat, kunci_baris
+
+JENIS = benchmark.JENIS_PELAKSANAAN
+TAHUN = benchmark.daftar_tahun(N_TAHUN)[0]
+
+def test_agregat_inkremental_sama_dengan_hitung_ulang(app):
+    rng = random.Random(20)
+    baru = 0
+    for _ in range(60):
+        df = app.get_dataset(JENIS, TAHUN)
+        pilihan = rng.sample(range(len(df)), 3)
+        aksi = rng.choice(["ubah", "ubah", "kosongkan", "tambah", "hapus", "campur"])
+        ubah, tambah, hapus = [], [], []
+        if aksi in ("ubah", "campur"):
+            ubah = [(kunci_baris(df, pos), {"Nilai": rng.choice([float(rng.randint(4, 28)), rng.randint(8, 56) / 2])})
+                    for pos in pilihan[:2]]
+        if aksi == "kosongkan":
+            ubah = [(kunci_baris(df, pilihan[0]), {"Nilai": np.nan})]
+        if aksi in ("hapus", "campur"):
+            hapus = [kunci_baris(df, pilihan[2])]
+        if aksi in ("tambah", "campur"):
+            baru += 1
+            nama = rng.choice([f"Guru Tambahan {baru}", df.at[pilihan[0], "Nama Guru"]])
+            for periode in rng.sample(["1st", "2nd"], rng.randint(1, 2)):
+                tambah.append({"Nama Guru": nama, "Periode": periode, "Tahun": TAHUN, "Indikator": f"Z{baru}",
+                               "Nilai": float(rng.randint(4, 28))})
+        app.terapkan_perubahan(JENIS, TAHUN, ubah=ubah, tambah=tambah, hapus=hapus)
+
+        df = app.get_dataset(JENIS, TAHUN)
+        cek_agregat(app.agregat[(JENIS, TAHUN)], df, app)
+        kartu = app.hitung_kartu(JENIS, TAHUN)
+        app.agregat[(JENIS, TAHUN)] = app.bangun_agregat(df)
+        assert app.hitung_kartu(JENIS, TAHUN) == kartu
@@ -0,0 +1,20 @@
+from urllib.parse import quote
+
+from conftest import JENIS, TAHUN
+
+def test_nilai_guru_tidak_dibuka_tanpa_token(app, monkeypatch):
+    klien = app.server.test_client()
+    daftar = f"/api/{quote(JENIS)}/{TAHUN}/guru"
+
+    monkeypatch.setattr(app, "API_TOKEN", None)
+    assert klien.get(daftar).status_code == 503
+    assert klien.get(f"{daftar}/siapa").status_code == 503
+    assert klien.get(f"/api/{quote(JENIS)}/{TAHUN}/ringkasan").status_code == 200
+
+    monkeypatch.setattr(app, "API_TOKEN", "rahasia")
+    assert klien.get(daftar).status_code == 401
+    respon = klien.get(daftar, headers={"Authorization": "Bearer rahasia"})
+    assert respon.status_code == 200
+    nama = respon.get_json()["guru"][0]["nama"]
+    respon = klien.get(f"{daftar}/{quote(nama)}", headers={"Authorization": "Bearer rahasia"})
+    assert respon.status_code == 200 and respon.get_json()["guru"] == [nama]
@@ -0,0 +1,31 @@
+import json
+import os
+import threading
+
+from conftest import JENIS, N_GURU, TAHUN
+
+def test_ekspor_bersamaan_ke_folder_yang_sama(app, tmp_path):
+    # Dashboard dan ekspor.py bisa mengekspor dataset yang sama bersamaan; tidak boleh saling menimpa file sementara
+    hasil, galat = [], []
+
+    def ekspor():
+        try:
+            hasil.append(app.ekspor_laporan(JENIS, TAHUN, "html", dasar=str(tmp_path), max_worker=1))
+        except Exception as e:
+            galat.append(e)
+
+    threads = [threading.Thread(target=ekspor) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not galat
+    folder = hasil[0]["folder"]
+    assert [h["total"] for h in hasil] == [N_GURU, N_GURU]
+    assert not [nama for nama in os.listdir(folder) if nama.endswith(".tmp")]
+    with open(os.path.join(folder, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    for catatan in manifest["guru"].values():
+        assert os.path.exists(os.path.join(folder, catatan["file"]))
+    assert app.ekspor_laporan(JENIS, TAHUN, "html", dasar=str(tmp_path))["dari_cache"] == N_GURU
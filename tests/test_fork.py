@@ -0,0 +1,30 @@
+import os
+import threading
+from concurrent.futures import Future
+
+def test_fork_tidak_mewarisi_future_dan_kunci(app):
+    # Seperti job background yang di-fork saat dataset masih dimuat dan thread lain memegang kunci
+    app._muat_futures[("Penilaian Uji Fork", "2000-2001")] = Future()
+    dipegang, lepas = threading.Event(), threading.Event()
+
+    def pegang_kunci():
+        with app._muat_lock, app._username_lock, app._segarkan_lock, app._versi_lock:
+            dipegang.set()
+            lepas.wait()
+
+    t = threading.Thread(target=pegang_kunci)
+    t.start()
+    dipegang.wait()
+    try:
+        pid = os.fork()
+        if pid == 0:
+            ok = (not app.masih_memuat() and ("Penilaian Uji Fork", "2000-2001") not in app._muat_futures
+                  and all(kunci.acquire(timeout=5) for kunci in (app._muat_lock, app._username_lock,
+                                                                  app._segarkan_lock, app._versi_lock)))
+            os._exit(0 if ok else 1)
+        _, status = os.waitpid(pid, 0)
+    finally:
+        lepas.set()
+        t.join()
+        del app._muat_futures[("Penilaian Uji Fork", "2000-2001")]
+    assert os.waitstatus_to_exitcode(status) == 0
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+JENIS_UJI = "Penilaian Uji Tren"
+
+def _frame(tahun, nilai_per_guru):
+    return pd.DataFrame([{"Nama Guru": nama, "Periode": periode, "Tahun": tahun, "Indikator": indikator, "Nilai": nilai}
+                         for nama, nilai in nilai_per_guru.items() for periode in ("1st", "2nd")
+                         for indikator in ("A", "B")])
+
+def test_tren_guru_tanpa_nilai(app):
+    tahun_list = ["2000-2001", "2001-2002"]
+    app.datasets[JENIS_UJI] = {}
+    try:
+        app.ganti_dataset(JENIS_UJI, tahun_list[0], _frame(tahun_list[0], {"Guru Lama": 20.0, "Guru Kosong": np.nan}))
+        app.ganti_dataset(JENIS_UJI, tahun_list[1], _frame(tahun_list[1], {"Guru Lama": 22.0, "Guru Baru": 10.0,
+                                                                           "Guru Kosong": np.nan}))
+        kubus = app.bangun_kubus(JENIS_UJI, tahun_list)
+
+        kosong = kubus["posisi"]["gurukosong"]
+        assert kubus["angkatan"][kosong] == -1
+        nama_garis = [t.name for t in app.buat_grafik_tren(kubus, "rata2", kosong).data]
+        assert nama_garis == ["Rata-rata sekolah", "Guru Kosong"]
+
+        baru = kubus["posisi"]["gurubaru"]
+        garis = {t.name: t for t in app.buat_grafik_tren(kubus, "rata2", baru).data}
+        assert f"Rata-rata angkatan {tahun_list[1]}" in garis
+    finally:
+        for tahun in app.datasets.pop(JENIS_UJI):
+            app.perbarui_username_index(JENIS_UJI, tahun, None)
@@ -0,0 +1,23 @@
+from conftest import ADMIN, JENIS, TAHUN
+
+def test_hapus_campuran_baris_belum_disimpan_dan_tersimpan(app):
+    df = app.get_dataset(JENIS, TAHUN)
+    kunci = [tuple(df.loc[pos, ["Nama Guru", "Periode", "Indikator"]]) for pos in (3, 4)]
+    ids = [None, app.id_baris(TAHUN, *kunci[0]), "", app.id_baris(TAHUN, *kunci[1])]
+
+    patch, terpilih, versi, pesan = app.delete_row(1, [0, 1, 2, 3], ids, JENIS, ADMIN)
+
+    assert pesan == "🗑️ Baris dihapus."
+    assert terpilih == []
+    assert len(patch.to_plotly_json()["operations"]) == 4  # Baris tanpa id tetap dibuang dari tabel
+    for k in kunci:
+        assert app.posisi_baris(JENIS, TAHUN, *k) is None
+    db = app.baca_dataset_db(JENIS, TAHUN)[0]
+    assert not any(((db["Nama Guru"] == n) & (db["Periode"] == p) & (db["Indikator"] == i)).any() for n, p, i in kunci)
+
+def test_hapus_hanya_baris_belum_disimpan(app):
+    versi = app.versi_db_lokal[(JENIS, TAHUN)]
+    patch, terpilih, _, pesan = app.delete_row(1, [0], [None], JENIS, ADMIN)
+    assert pesan == "🗑️ Baris dihapus."
+    assert len(patch.to_plotly_json()["operations"]) == 1
+    assert app.versi_db_lokal[(JENIS, TAHUN)] == versi
@@ -0,0 +1,20 @@
+from concurrent.futures import Future
+
+from conftest import JENIS, TAHUN
+
+def test_login_tidak_menunggu_dataset_yang_masih_dimuat(app, monkeypatch):
+    nama = sorted(app.username_index)[0]
+    monkeypatch.delitem(app.datasets[JENIS], TAHUN)
+    monkeypatch.setattr(app, "muat_dataset", lambda jenis, tahun: Future())
+
+    # Guru yang sudah ada di index langsung masuk, yang belum diminta coba lagi tanpa menunggu
+    sesi, pesan = app.login(1, f"{nama}@ses.com", "testing123")
+    assert sesi["role"] == "user"
+    assert app.cek_username("belum ada") is None
+    sesi, pesan = app.login(1, "belum ada@ses.com", "testing123")
+    assert sesi is app.dash.no_update and "masih dimuat" in pesan
+
+def test_login_nama_tidak_ada_setelah_semua_dimuat(app):
+    assert app.cek_username("belum ada") is False
+    sesi, pesan = app.login(1, "zzqx@ses.com", "testing123")
+    assert "tidak ditemukan" in pesan
@@ -0,0 +1,33 @@
+import os
+
+import benchmark
+from conftest import JENIS, N_GURU, N_TAHUN, TAHUN
+
+def test_workbook_berubah_tidak_menimpa_database(app, capsys):
+    path = app.dataset_files[JENIS][TAHUN]
+    versi = app.versi_db_lokal[(JENIS, TAHUN)]
+    sebelum = app.get_dataset(JENIS, TAHUN)
+
+    benchmark.buat_workbook(path, JENIS, N_GURU, seed=12345)
+    os.utime(path, ns=(1, 1))
+    app.pindai_data_dir()  # Pindaian pertama hanya mencatat ukuran & mtime baru
+    app.pindai_data_dir()
+
+    assert "tidak diimpor ulang" in capsys.readouterr().out
+    assert app.versi_dataset_db(JENIS, TAHUN) == versi
+    assert app.get_dataset(JENIS, TAHUN) is sebelum
+    # Saat start ulang pun database yang dipakai, dengan peringatan yang sama
+    (df, versi_muat), _, asal = app._muat_worker(path, TAHUN, JENIS)
+    assert (asal, versi_muat) == ("database", versi)
+    assert "tidak diimpor ulang" in capsys.readouterr().out
+
+def test_mtime_berubah_tanpa_isi_berubah_tidak_diberi_peringatan(app, capsys):
+    tahun = benchmark.daftar_tahun(N_TAHUN)[0]
+    path = app.dataset_files[JENIS][tahun]
+    app.get_dataset(JENIS, tahun, tunggu=True)
+    capsys.readouterr()
+
+    os.utime(path, ns=(2, 2))
+    app.pindai_data_dir()
+    app.pindai_data_dir()
+    assert "tidak diimpor ulang" not in capsys.readouterr().out
@@ -0,0 +1,186 @@
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import benchmark
+from conftest import FOLDER, N_TAHUN, cek_agregat, kunci_baris
+
+JENIS = benchmark.JENIS_RPP
+TAHUN = benchmark.daftar_tahun(N_TAHUN)[0]
+
+def _nilai(app, kunci):
+    df = app.get_dataset(JENIS, TAHUN)
+    return df.at[app.posisi_baris(JENIS, TAHUN, *kunci), "Nilai"]
+
+def test_edit_basi_baris_lain_digabung(app):
+    df = app.get_dataset(JENIS, TAHUN)
+    a, b = kunci_baris(df, 0), kunci_baris(df, 1)
+    versi_muat, nilai_b = app.versi_db_lokal[(JENIS, TAHUN)], df.at[1, "Nilai"]
+
+    # Pengguna lain menyimpan baris a lebih dulu; edit baris b yang dimuat dari versi lama tetap masuk
+    app.terapkan_perubahan(JENIS, TAHUN, ubah=[(a, {"Nilai": 11.0})])
+    hasil = app.terapkan_perubahan(JENIS, TAHUN, ubah=[(b, {"Nilai": 12.0})], harapan={b: (versi_muat, nilai_b)})
+
+    assert hasil["konflik"] == []
+    assert hasil["versi"] == versi_muat + 2
+    assert (_nilai(app, a), _nilai(app, b)) == (11.0, 12.0)
+
+def test_edit_basi_baris_sama_konflik(app):
+    df = app.get_dataset(JENIS, TAHUN)
+    a = kunci_baris(df, 2)
+    versi_muat, nilai_a = app.versi_db_lokal[(JENIS, TAHUN)], df.at[2, "Nilai"]
+
+    app.terapkan_perubahan(JENIS, TAHUN, ubah=[(a, {"Nilai": 21.0})])
+    hasil = app.terapkan_perubahan(JENIS, TAHUN, ubah=[(a, {"Nilai": 22.0})], harapan={a: (versi_muat, nilai_a)})
+
+    assert hasil["konflik"] == [a]
+    assert hasil["versi"] == versi_muat + 1  # Tidak ada yang ditulis
+    assert _nilai(app, a) == 21.0
+    # Isi yang kebetulan sudah sama bukan konflik
+    hasil = app.terapkan_perubahan(JENIS, TAHUN, ubah=[(a, {"Nilai": 21.0})], harapan={a: (versi_muat, nilai_a)})
+    assert hasil["konflik"] == []
+
+# Worker lain (proses terpisah, database yang sama) menulis baris miliknya sendiri
+_SKRIP_WORKER = """
+import json, random, sys
+sys.path.insert(0, sys.argv[1])
+import app
+jenis, tahun, n = sys.argv[2], sys.argv[3], int(sys.argv[4])
+kunci = [tuple(k) for k in json.loads(sys.argv[5])]
+app.get_dataset(jenis, tahun, tunggu=True)
+print("siap", flush=True)
+sys.stdin.readline()  # Mulai bersamaan dengan penulis di proses tes
+tertulis = {}
+for i in range(n):
+    k = random.choice(kunci)
+    try:
+        app.terapkan_perubahan(jenis, tahun, ubah=[(k, {"Nilai": float(i)})])
+    except ValueError:
+        continue
+    tertulis["|".join(k)] = float(i)
+print(json.dumps(tertulis))
+"""
+
+def test_penulis_bersamaan_tetap_konsisten(app):
+    df = app.get_dataset(JENIS, TAHUN)
+    semua = [kunci_baris(df, pos) for pos in range(10, 70)]
+    bagian = [semua[i::4] for i in range(4)]  # Tiap penulis punya baris sendiri
+    n_edit = 30
+    tertulis = {}
+    lock = threading.Lock()
+
+    def penulis_thread(kunci):
+        for i in range(n_edit):
+            k = random.choice(kunci)
+            nilai = float(100 + i)
+            try:
+                app.terapkan_perubahan(JENIS, TAHUN, ubah=[(k, {"Nilai": nilai})])
+            except ValueError:
+                continue
+            with lock:
+                tertulis[k] = nilai
+
+    worker = subprocess.Popen([sys.executable, "-c", _SKRIP_WORKER, FOLDER, JENIS, TAHUN, str(n_edit),
+                               json.dumps(bagian[0])], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    while worker.stdout.readline().strip() != "siap":
+        assert worker.poll() is None
+    threads = [threading.Thread(target=penulis_thread, args=(k,)) for k in bagian[1:]]
+    for t in threads:
+        t.start()
+    keluaran, _ = worker.communicate("mulai\n", timeout=300)
+    for t in threads:
+        t.join()
+    assert worker.returncode == 0
+    tertulis.update({tuple(k.split("|")): v for k, v in json.loads(keluaran.strip().splitlines()[-1]).items()})
+    assert tertulis
+
+    app.segarkan_dataset()  # Seperti awal request berikutnya: commit worker lain terlihat lewat data_version
+    df = app.get_dataset(JENIS, TAHUN)
+    assert app.versi_db_lokal[(JENIS, TAHUN)] == app.versi_dataset_db(JENIS, TAHUN)
+
+    # Memori sama persis dengan isi tabel nilai di database (bukan snapshot)
+    db = pd.read_sql_query("SELECT nama_guru, periode, indikator, nilai FROM nilai WHERE jenis = ? AND tahun = ? "
+                           "ORDER BY urutan", app._db(), params=(JENIS, TAHUN))
+    memori = df[["Nama Guru", "Periode", "Indikator", "Nilai"]].astype({"Nama Guru": str, "Periode": str,
+                                                                        "Indikator": str})
+    assert memori.fillna(-1).to_numpy().tolist() == db.fillna(-1).to_numpy().tolist()
+    for k, nilai in tertulis.items():
+        assert _nilai(app, k) == nilai
+    cek_agregat(app.agregat[(JENIS, TAHUN)], df, app)
+
+def test_edit_nilai_tanpa_bangun_ulang_index_dan_snapshot(app):
+    df_lama = app.get_dataset(JENIS, TAHUN)
+    _, index_lama = app.guru_index[(JENIS, TAHUN)]
+    a = kunci_baris(df_lama, 5)
+    nilai_lama = df_lama.at[5, "Nilai"]
+    app._snapshot_terakhir[(JENIS, TAHUN)] = (app.versi_db_lokal[(JENIS, TAHUN)], time.monotonic())
+
+    hasil = app.terapkan_perubahan(JENIS, TAHUN, ubah=[(a, {"Nilai": nilai_lama + 1})])
+
+    assert app.guru_index[(JENIS, TAHUN)][1] is index_lama
+    assert df_lama.at[5, "Nilai"] == nilai_lama  # Frame lama yang mungkin masih dibaca tidak ikut berubah
+    assert _nilai(app, a) == nilai_lama + 1
+    assert not os.path.exists(app._path_snapshot(JENIS, TAHUN, hasil["versi"]))
+    # Worker lain yang memuat versi ini membaca tabel nilai, lalu menulis snapshotnya
+    df_db, versi = app.baca_dataset_db(JENIS, TAHUN)
+    assert versi == hasil["versi"]
+    assert df_db.at[5, "Nilai"] == nilai_lama + 1
+    assert os.path.exists(app._path_snapshot(JENIS, TAHUN, versi))
+
+def test_banyak_pembaca_menulis_snapshot_bersamaan(app):
+    versi = app.versi_db_lokal[(JENIS, TAHUN)]
+    app.hapus_snapshot(JENIS, TAHUN, versi)
+    mulai, hasil = threading.Barrier(8), []
+
+    def baca():
+        mulai.wait()
+        hasil.append(app.baca_dataset_db(JENIS, TAHUN)[1])
+
+    threads = [threading.Thread(target=baca) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert hasil == [versi] * 8
+    assert os.path.exists(app._path_snapshot(JENIS, TAHUN, versi))
+    assert not [nama for nama in os.listdir(app.SNAPSHOT_DIR) if nama.endswith(".tmp")]
+
+def test_segarkan_gagal_dicoba_lagi_di_request_berikutnya(app, monkeypatch):
+    kunci = (JENIS, TAHUN)
+    versi = app.versi_db_lokal[kunci]
+    baca_asli, kunci_dipegang = app.baca_dataset_db, []
+
+    def baca_gagal(jenis, tahun):
+        kunci_dipegang.append(app._segarkan_lock.locked())
+        raise sqlite3.OperationalError("database is locked")
+
+    # Seolah worker lain sudah commit versi yang lebih baru dari yang ada di memori
+    app.versi_db_lokal[kunci] = versi - 1
+    app._penanda_pantau = None
+    monkeypatch.setattr(app, "baca_dataset_db", baca_gagal)
+    with pytest.raises(sqlite3.OperationalError):
+        app.segarkan_dataset()
+    assert kunci_dipegang == [False]  # Memuat ulang tidak menahan request lain
+    assert app._penanda_pantau is None
+
+    monkeypatch.setattr(app, "baca_dataset_db", baca_asli)
+    app.segarkan_dataset()
+    assert app.versi_db_lokal[kunci] == versi
+
+def test_request_non_callback_tidak_memeriksa_versi(app, monkeypatch):
+    dipanggil = []
+    monkeypatch.setattr(app, "segarkan_dataset", lambda: dipanggil.append(True))
+    klien = app.server.test_client()
+    assert klien.get("/metrics").status_code == 200
+    assert dipanggil == []
+    klien.get("/api/dataset")
+    assert dipanggil == [True]